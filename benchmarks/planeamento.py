@@ -0,0 +1,207 @@
+"""Benchmark dos caminhos quentes do planeamento, sem Streamlit nem Firebase.
+
+Gera um catálogo sintético (tamanho, profundidade de sub-receitas e ramificação
+configuráveis) numa base SQLite em memória, monta uma fila de produção e mede
+cada etapa. O resultado sai em JSON para comparar entre commits:
+
+    python -m benchmarks.planeamento --receitas 2000 --profundidade 6 --fila 300 --saida bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from panela import CatalogoIngredientes, CatalogoReceitas, GrafoReceitas
+from panela.armazenamento import SQLiteArmazenamento
+from panela.compras import consolidar, formatar_lista_compras, lista_compras
+from panela.custos import precificar_fila
+from panela.pacotes import _otimizar
+
+UNIDADES = [("g", "g"), ("kg", "g"), ("ml", "ml"), ("L", "ml"), ("unid", "unid")]
+
+
+# --- DADOS SINTÉTICOS ---
+def gerar_catalogo(armazenamento, receitas=500, profundidade=4, ramificacao=3, ingredientes=200, semente=42):
+    aleatorio = random.Random(semente)
+    mestre = {}
+    for i in range(ingredientes):
+        unidade, _ = aleatorio.choice(UNIDADES)
+        tam = 1 if unidade in ("kg", "L") else aleatorio.choice([250, 500, 1000, 12])
+        mestre[f"ing_{i}"] = {
+            "nome": f"Ing {i}", "unidade": unidade, "tam_pacote": tam,
+            "preco_compra": round(aleatorio.uniform(2, 60), 2),
+            "skus": [{"tam_pacote": tam * 5, "preco_compra": round(aleatorio.uniform(8, 250), 2)}],
+        }
+    armazenamento.gravar("ingredients", mestre)
+
+    # Receitas repartidas por níveis; as do nível N usam sub-receitas dos níveis abaixo.
+    niveis = [[] for _ in range(profundidade + 1)]
+    documentos = {}
+    for i in range(receitas):
+        nivel = min(i * (profundidade + 1) // max(receitas, 1), profundidade)
+        nome = f"Receita {i}"
+        linhas = []
+        for ing_id in aleatorio.sample(list(mestre), k=min(6, len(mestre))):
+            dados = mestre[ing_id]
+            qtd = round(dados["tam_pacote"] * aleatorio.uniform(0.05, 0.8), 3)
+            linhas.append({
+                "tipo": "Ingrediente", "nome": dados["nome"], "ingrediente_id": ing_id,
+                "preco_compra": dados["preco_compra"], "tam_pacote": dados["tam_pacote"],
+                "unidade": dados["unidade"], "qtd_usada": qtd, "custo_final": dados["preco_compra"] / dados["tam_pacote"] * qtd,
+            })
+        abaixo = [n for nivel_sub in niveis[:nivel] for n in nivel_sub]
+        for sub in aleatorio.sample(abaixo, k=min(ramificacao, len(abaixo))):
+            # Custos já fechados: as sub-receitas vêm sempre de níveis gerados antes.
+            custo_sub, rendimento_sub, qtd = documentos[sub]["total_cost"], documentos[sub]["rendimento"], aleatorio.randint(1, 4)
+            linhas.append({
+                "tipo": "Sub-receita", "nome": sub, "preco_compra": custo_sub, "tam_pacote": rendimento_sub,
+                "unidade": "porções", "qtd_usada": qtd, "custo_final": custo_sub / rendimento_sub * qtd,
+            })
+        documentos[nome] = {
+            "name": nome, "author": "Bench", "rendimento": aleatorio.randint(4, 20), "ingredients": linhas,
+            "total_cost": sum(linha["custo_final"] for linha in linhas),
+        }
+        niveis[nivel].append(nome)
+    armazenamento.gravar("recipes", {nome.replace(" ", "_").lower(): doc for nome, doc in documentos.items()})
+
+
+def gerar_fila(catalogo, tamanho, semente=42):
+    aleatorio = random.Random(semente)
+    receitas = catalogo.listar()
+    return [{"receita": aleatorio.choice(receitas), "qtd": float(aleatorio.randint(1, 10)), "preco_venda_porcao": None} for _ in range(tamanho)]
+
+
+# --- LÓGICA DE REFERÊNCIA (como estava em recipe_app.py) ---
+def extrair_ingredientes_base(receita, mult_atual, dict_receitas):
+    ingredientes_finais = []
+    for ing in receita['ingredients']:
+        if ing.get('tipo', 'Ingrediente') == 'Sub-receita':
+            sub_rec_dados = dict_receitas.get(ing['nome'])
+            if sub_rec_dados:
+                tam_pacote = max(ing['tam_pacote'], 0.0001)
+                mult_sub = (ing['qtd_usada'] / tam_pacote) * mult_atual
+                ingredientes_finais.extend(extrair_ingredientes_base(sub_rec_dados, mult_sub, dict_receitas))
+        else:
+            ing_copy = ing.copy()
+            medida = ing_copy.get('unidade', 'unid')
+            qtd = ing_copy.get('qtd_usada', 0)
+            tam = max(ing_copy.get('tam_pacote', 1), 0.0001)
+            if medida == 'kg':
+                qtd *= 1000; tam *= 1000; medida = 'g'
+            elif medida == 'L':
+                qtd *= 1000; tam *= 1000; medida = 'ml'
+            ing_copy['qtd_usada'] = qtd * mult_atual
+            ing_copy['tam_pacote'] = tam
+            ing_copy['unidade'] = medida
+            ing_copy['custo_final'] = (ing_copy['preco_compra'] / tam) * ing_copy['qtd_usada']
+            ingredientes_finais.append(ing_copy)
+    return ingredientes_finais
+
+
+def lista_compras_df(ingredientes_por_item, mestre):
+    # Consolidação + pacotes como no Planeador (lista de compras otimizada).
+    consolidados, _ = consolidar(ingredientes_por_item)
+    itens, _ = lista_compras(consolidados, mestre)
+    return pd.DataFrame(formatar_lista_compras(itens))
+
+
+# --- MEDIÇÃO ---
+def medir(funcao, repeticoes, preparar=None):
+    """Mediana e mínimo de `repeticoes` execuções; `preparar` corre antes de cada uma, fora do tempo."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, {"mediana_ms": round(statistics.median(tempos), 3), "min_ms": round(min(tempos), 3), "repeticoes": repeticoes}
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(receitas, profundidade, ramificacao, ingredientes, fila, repeticoes, semente, legado=True):
+    armazenamento = SQLiteArmazenamento(":memory:")
+    gerar_catalogo(armazenamento, receitas, profundidade, ramificacao, ingredientes, semente)
+    catalogo = CatalogoReceitas(armazenamento)
+    mestre = CatalogoIngredientes(armazenamento)
+    fila_producao = gerar_fila(catalogo, fila, semente)
+    resultados = {}
+
+    _, resultados["carga_catalogo"] = medir(lambda: CatalogoReceitas(armazenamento).listar(), repeticoes)
+    receitas_por_nome = catalogo.por_nome()
+    indice = mestre.indice()
+    grafo, resultados["construcao_grafo"] = medir(lambda: GrafoReceitas(receitas_por_nome, indice), repeticoes)
+    if legado:
+        _, resultados["achatamento_legado"] = medir(
+            lambda: [extrair_ingredientes_base(item['receita'], item['qtd'], receitas_por_nome) for item in fila_producao], repeticoes
+        )
+    expandidos, resultados["achatamento"] = medir(
+        lambda: [grafo.expandir(item['receita'], item['qtd']) for item in fila_producao], repeticoes
+    )
+    # Sem limpar o lru_cache do otimizador, só a primeira repetição mediria a programação dinâmica.
+    df_compras, resultados["consolidacao"] = medir(
+        lambda: lista_compras_df(expandidos, mestre), repeticoes, preparar=_otimizar.cache_clear
+    )
+    df_precificacao, resultados["precificacao"] = medir(lambda: precificar_fila(fila_producao, grafo, 3.0), repeticoes)
+    _, resultados["exportacao_csv"] = medir(lambda: (
+        df_precificacao.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'),
+        df_compras.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig'),
+    ), repeticoes)
+
+    return {
+        "parametros": {
+            "receitas": receitas, "profundidade": profundidade, "ramificacao": ramificacao,
+            "ingredientes": ingredientes, "fila": fila, "repeticoes": repeticoes, "semente": semente,
+        },
+        "ambiente": {
+            "commit": commit_atual(), "python": platform.python_version(),
+            "pandas": pd.__version__, "numpy": np.__version__,
+        },
+        "volumes": {
+            "linhas_achatadas": sum(len(linhas) for linhas in expandidos),
+            "itens_lista_compras": len(df_compras),
+        },
+        "resultados": resultados,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receitas", type=int, default=500)
+    parser.add_argument("--profundidade", type=int, default=4, help="níveis de sub-receitas")
+    parser.add_argument("--ramificacao", type=int, default=3, help="sub-receitas por receita")
+    parser.add_argument("--ingredientes", type=int, default=200)
+    parser.add_argument("--fila", type=int, default=100, help="itens na fila de produção")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--sem-legado", action="store_true", help="não mede o achatamento recursivo antigo (explode em árvores fundas)")
+    parser.add_argument("--saida", help="ficheiro JSON (por omissão, stdout)")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(
+        args.receitas, args.profundidade, args.ramificacao, args.ingredientes,
+        args.fila, args.repeticoes, args.semente, legado=not args.sem_legado,
+    )
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as ficheiro:
+            ficheiro.write(texto + "\n")
+    else:
+        sys.stdout.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
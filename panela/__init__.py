@@ -0,0 +1,10 @@
+from panela.catalogo import CacheColecao, CatalogoReceitas
+from panela.grafo import ErroCicloReceitas, GrafoReceitas
+from panela.ingredientes import CatalogoIngredientes, id_ingrediente, normalizar_nome
+from panela.servico import ServicoPanela
+from panela.unidades import MEDIDAS, normalizar_unidade
+
+__all__ = [
+    "CacheColecao", "CatalogoIngredientes", "CatalogoReceitas", "ErroCicloReceitas", "GrafoReceitas",
+    "MEDIDAS", "ServicoPanela", "id_ingrediente", "normalizar_nome", "normalizar_unidade",
+]
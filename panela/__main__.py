@@ -0,0 +1,3 @@
+from panela.cli import main
+
+main()
@@ -0,0 +1,195 @@
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+LIMITE_LOTE_FIRESTORE = 500
+
+
+class Armazenamento(ABC):
+    """Interface de persistência das coleções `recipes`, `ingredients` e `productions`.
+
+    Os documentos circulam como dicts com `id`; `gravar` funde os campos no
+    documento existente (como `set(..., merge=True)`) e carimba `updated_at`.
+    """
+
+    @abstractmethod
+    def listar(self, colecao, campos=None):
+        """Todos os documentos da coleção; com `campos`, só esses campos (projeção)."""
+
+    @abstractmethod
+    def obter(self, colecao, doc_ids):
+        """{doc_id: documento} dos IDs pedidos que existem, numa só leitura em lote."""
+
+    @abstractmethod
+    def alterados_desde(self, colecao, instante):
+        """Documentos com `updated_at` posterior a `instante`."""
+
+    @abstractmethod
+    def gravar(self, colecao, documentos):
+        """Funde {doc_id: dados} na coleção, em lote."""
+
+    @abstractmethod
+    def apagar(self, colecao, doc_ids):
+        """Apaga os IDs indicados, em lote."""
+
+    def ouvir(self, colecao, callback):
+        """Subscreve alterações; `callback` recebe [(doc_id, dados ou None se apagado)].
+
+        Devolve uma função para cancelar, ou None se o backend não suporta listeners.
+        """
+        return None
+
+    def obter_um(self, colecao, doc_id):
+        return self.obter(colecao, [doc_id]).get(doc_id)
+
+
+class FirestoreArmazenamento(Armazenamento):
+    def __init__(self, db):
+        self._db = db
+
+    def _ref(self, colecao, doc_id):
+        return self._db.collection(colecao).document(doc_id)
+
+    def listar(self, colecao, campos=None):
+        consulta = self._db.collection(colecao)
+        if campos is not None:
+            consulta = consulta.select(list(campos))
+        return [{"id": doc.id, **doc.to_dict()} for doc in consulta.stream()]
+
+    def obter(self, colecao, doc_ids):
+        refs = [self._ref(colecao, doc_id) for doc_id in doc_ids]
+        return {doc.id: {"id": doc.id, **doc.to_dict()} for doc in self._db.get_all(refs) if doc.exists}
+
+    def alterados_desde(self, colecao, instante):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        consulta = self._db.collection(colecao).where(filter=FieldFilter("updated_at", ">", instante))
+        return [{"id": doc.id, **doc.to_dict()} for doc in consulta.stream()]
+
+    def gravar(self, colecao, documentos):
+        from google.cloud import firestore
+
+        self._em_lotes(documentos.items(), lambda batch, item: batch.set(
+            self._ref(colecao, item[0]), {**item[1], "updated_at": firestore.SERVER_TIMESTAMP}, merge=True
+        ))
+
+    def apagar(self, colecao, doc_ids):
+        self._em_lotes(doc_ids, lambda batch, doc_id: batch.delete(self._ref(colecao, doc_id)))
+
+    def _em_lotes(self, itens, operacao):
+        itens = list(itens)
+        for inicio in range(0, len(itens), LIMITE_LOTE_FIRESTORE):
+            batch = self._db.batch()
+            for item in itens[inicio:inicio + LIMITE_LOTE_FIRESTORE]:
+                operacao(batch, item)
+            batch.commit()
+
+    def ouvir(self, colecao, callback):
+        def ao_mudar(_snapshot, mudancas, _read_time):
+            callback([
+                (m.document.id, None if m.type.name == "REMOVED" else m.document.to_dict()) for m in mudancas
+            ])
+
+        watch = self._db.collection(colecao).on_snapshot(ao_mudar)
+        return watch.unsubscribe
+
+
+class SQLiteArmazenamento(Armazenamento):
+    """Backend embutido: uma tabela por coleção, com o documento em JSON.
+
+    O nome e o `updated_at` ficam também em colunas próprias e indexadas, para a
+    projeção da lista de planos e a consulta delta não terem de abrir o JSON.
+    Uma única ligação é partilhada entre as threads do Streamlit.
+    """
+
+    # coleção -> campo guardado na coluna `nome`
+    COLECOES = {"recipes": "name", "ingredients": "nome", "productions": "nome"}
+
+    def __init__(self, caminho="panela.db"):
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for colecao in self.COLECOES:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {colecao} "
+                    "(id TEXT PRIMARY KEY, nome TEXT, updated_at TEXT NOT NULL, dados TEXT NOT NULL)"
+                )
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {colecao}_nome ON {colecao} (nome)")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {colecao}_updated_at ON {colecao} (updated_at)")
+
+    def _tabela(self, colecao):
+        if colecao not in self.COLECOES:
+            raise ValueError(f"Coleção desconhecida: {colecao}")
+        return colecao
+
+    @staticmethod
+    def _documento(doc_id, updated_at, dados):
+        return {"id": doc_id, **json.loads(dados), "updated_at": datetime.fromisoformat(updated_at)}
+
+    @staticmethod
+    def _instante(valor):
+        # ISO com microssegundos fixos em UTC: a ordem do texto é a ordem do tempo.
+        return valor.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+    def listar(self, colecao, campos=None):
+        tabela = self._tabela(colecao)
+        campo_nome = self.COLECOES[colecao]
+        if campos is not None and set(campos) <= {campo_nome, "updated_at"}:
+            with self._lock:
+                linhas = self._conn.execute(f"SELECT id, nome, updated_at FROM {tabela}").fetchall()
+            return [
+                {"id": doc_id, **{c: v for c, v in ((campo_nome, nome), ("updated_at", datetime.fromisoformat(atualizado))) if c in campos}}
+                for doc_id, nome, atualizado in linhas
+            ]
+        with self._lock:
+            linhas = self._conn.execute(f"SELECT id, updated_at, dados FROM {tabela}").fetchall()
+        documentos = [self._documento(*linha) for linha in linhas]
+        if campos is not None:
+            documentos = [{"id": d["id"], **{c: d[c] for c in campos if c in d}} for d in documentos]
+        return documentos
+
+    def obter(self, colecao, doc_ids):
+        linhas = self._por_ids(self._tabela(colecao), "id, updated_at, dados", list(doc_ids))
+        return {linha[0]: self._documento(*linha) for linha in linhas}
+
+    def alterados_desde(self, colecao, instante):
+        tabela = self._tabela(colecao)
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT id, updated_at, dados FROM {tabela} WHERE updated_at > ?", (self._instante(instante),)
+            ).fetchall()
+        return [self._documento(*linha) for linha in linhas]
+
+    def gravar(self, colecao, documentos):
+        tabela = self._tabela(colecao)
+        campo_nome = self.COLECOES[colecao]
+        agora = self._instante(datetime.now(timezone.utc))
+        with self._lock, self._conn:
+            existentes = {doc_id: json.loads(dados) for doc_id, dados in self._por_ids(tabela, "id, dados", list(documentos))}
+            linhas = []
+            for doc_id, dados in documentos.items():
+                fundido = {**existentes.get(doc_id, {}), **dados}
+                fundido.pop("id", None)
+                fundido.pop("updated_at", None)
+                linhas.append((doc_id, fundido.get(campo_nome), agora, json.dumps(fundido, ensure_ascii=False)))
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {tabela} (id, nome, updated_at, dados) VALUES (?, ?, ?, ?)", linhas
+            )
+
+    def _por_ids(self, tabela, colunas, doc_ids):
+        linhas = []
+        # Lotes abaixo do limite de parâmetros por consulta do SQLite.
+        with self._lock:
+            for inicio in range(0, len(doc_ids), 500):
+                parte = doc_ids[inicio:inicio + 500]
+                consulta = f"SELECT {colunas} FROM {tabela} WHERE id IN ({','.join('?' * len(parte))})"
+                linhas.extend(self._conn.execute(consulta, parte).fetchall())
+        return linhas
+
+    def apagar(self, colecao, doc_ids):
+        tabela = self._tabela(colecao)
+        with self._lock, self._conn:
+            self._conn.executemany(f"DELETE FROM {tabela} WHERE id = ?", [(doc_id,) for doc_id in doc_ids])
@@ -0,0 +1,195 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from panela.grafo import GrafoReceitas
+from panela.instrumentacao import etapa
+
+
+class CacheColecao:
+    """Cache de processo de uma coleção do armazenamento.
+
+    Carrega a coleção uma única vez e mantém-na fresca com um listener (no
+    Firestore). Se o backend não tiver listener, recorre a uma consulta delta por
+    `updated_at` quando os dados ficam mais velhos do que `idade_maxima` segundos.
+    """
+
+    def __init__(self, armazenamento, colecao, ouvir=True, idade_maxima=30.0, espera_inicial=10.0):
+        self._armazenamento = armazenamento
+        self._colecao = colecao
+        self._ouvir = ouvir
+        self._idade_maxima = idade_maxima
+        self._espera_inicial = espera_inicial
+        self._lock = threading.RLock()
+        self._lock_carga = threading.Lock()
+        self._primeiro_snapshot = threading.Event()
+        self._listener = None
+        self._documentos = {}
+        self._carregado = False
+        self._sincronizado_em = 0.0
+        self._ultimo_updated_at = None
+        self.versao = 0
+        self.contadores = {
+            "acertos": 0, "falhas": 0, "documentos_lidos": 0,
+            "consultas_delta": 0, "eventos_listener": 0, "leituras_desatualizadas": 0,
+        }
+
+    # --- CARGA E SINCRONIZAÇÃO ---
+    def _garantir_carregado(self):
+        with self._lock:
+            if self._carregado:
+                self.contadores["acertos"] += 1
+                if self._listener is None and time.monotonic() - self._sincronizado_em > self._idade_maxima:
+                    self.contadores["leituras_desatualizadas"] += 1
+                    self._consulta_delta()
+                return
+        # A carga inicial corre fora de `_lock`: o callback do listener precisa dele.
+        with self._lock_carga:
+            if self._carregado:
+                return
+            self.contadores["falhas"] += 1
+            if self._ouvir and self._iniciar_listener():
+                return
+            with self._lock:
+                self._carga_completa()
+
+    def _iniciar_listener(self):
+        try:
+            self._listener = self._armazenamento.ouvir(self._colecao, self._ao_mudar)
+        except Exception:
+            self._listener = None
+        if self._listener is None:
+            return False
+        # O primeiro snapshot do listener já traz o catálogo inteiro (tudo como ADDED).
+        if not self._primeiro_snapshot.wait(self._espera_inicial):
+            self.parar()
+            return False
+        return True
+
+    def _ao_mudar(self, mudancas):
+        with self._lock:
+            for doc_id, dados in mudancas:
+                if dados is None:
+                    self._documentos.pop(doc_id, None)
+                    self.versao += 1
+                else:
+                    self._guardar_local(doc_id, dados)
+                self.contadores["documentos_lidos"] += 1
+            self.contadores["eventos_listener"] += 1
+            self._marcar_sincronizado()
+            self._carregado = True
+        self._primeiro_snapshot.set()
+
+    def _carga_completa(self):
+        documentos = {doc["id"]: doc for doc in self._armazenamento.listar(self._colecao)}
+        self.contadores["documentos_lidos"] += len(documentos)
+        self._documentos = documentos
+        self.versao += 1
+        self._ultimo_updated_at = max(
+            (r["updated_at"] for r in documentos.values() if isinstance(r.get("updated_at"), datetime)),
+            default=None,
+        )
+        self._marcar_sincronizado()
+        self._carregado = True
+
+    def _consulta_delta(self):
+        # Sem listener não há aviso de documentos apagados por outros processos;
+        # as remoções feitas por este processo passam por `remover`.
+        if self._ultimo_updated_at is None:
+            self._carga_completa()
+            return
+        for doc in self._armazenamento.alterados_desde(self._colecao, self._ultimo_updated_at):
+            self._guardar_local(doc["id"], doc)
+            self.contadores["documentos_lidos"] += 1
+        self.contadores["consultas_delta"] += 1
+        self._marcar_sincronizado()
+
+    def _guardar_local(self, doc_id, dados):
+        self._documentos[doc_id] = {**dados, "id": doc_id}
+        self.versao += 1
+        atualizado = dados.get("updated_at")
+        if isinstance(atualizado, datetime) and (self._ultimo_updated_at is None or atualizado > self._ultimo_updated_at):
+            self._ultimo_updated_at = atualizado
+
+    def _marcar_sincronizado(self):
+        self._sincronizado_em = time.monotonic()
+
+    def parar(self):
+        if self._listener is not None:
+            self._listener()
+            self._listener = None
+
+    # --- LEITURA ---
+    def listar(self):
+        self._garantir_carregado()
+        with self._lock:
+            return list(self._documentos.values())
+
+    def obter(self, doc_id):
+        self._garantir_carregado()
+        with self._lock:
+            return self._documentos.get(doc_id)
+
+    # --- ESCRITA LOCAL (após gravar no armazenamento) ---
+    def aplicar(self, doc_id, dados):
+        """Funde `dados` no documento em cache, tal como um `set(..., merge=True)`."""
+        with self._lock:
+            atual = dict(self._documentos.get(doc_id, {}))
+            atual.update(dados)
+            atual.pop("id", None)
+            # SERVER_TIMESTAMP só é resolvido no servidor; localmente usamos o relógio,
+            # sem o tomar como marca da consulta delta (o relógio local pode adiantar-se).
+            if not isinstance(atual.get("updated_at"), datetime):
+                atual["updated_at"] = datetime.now(timezone.utc)
+            self._documentos[doc_id] = {"id": doc_id, **atual}
+            self.versao += 1
+
+    def remover(self, doc_id):
+        with self._lock:
+            if self._documentos.pop(doc_id, None) is not None:
+                self.versao += 1
+
+    # --- MÉTRICAS ---
+    def metricas(self):
+        with self._lock:
+            return {
+                **self.contadores,
+                "documentos": len(self._documentos),
+                "versao": self.versao,
+                "listener_ativo": self._listener is not None,
+                "idade_segundos": round(time.monotonic() - self._sincronizado_em, 1) if self._carregado else None,
+            }
+
+
+class CatalogoReceitas(CacheColecao):
+    def __init__(self, armazenamento, colecao="recipes", **opcoes):
+        super().__init__(armazenamento, colecao, **opcoes)
+        self._grafo = None
+        self._grafo_versao = None
+        self._por_nome = None
+        self._por_nome_versao = None
+
+    def por_nome(self):
+        """{nome: receita} da versão atual, refeito só quando o catálogo muda. Não alterar."""
+        self._garantir_carregado()
+        with self._lock:
+            if self._por_nome_versao != self.versao:
+                self._por_nome = {r["name"]: r for r in self._documentos.values()}
+                self._por_nome_versao = self.versao
+            return self._por_nome
+
+    def grafo(self, ingredientes=None):
+        """GrafoReceitas da versão atual, reconstruído só quando o catálogo muda.
+
+        Com o mestre de `ingredientes`, os custos passam a vir dos preços do mestre.
+        """
+        self._garantir_carregado()
+        # Um só retrato do mestre por construção: todas as linhas veem a mesma versão dos preços.
+        indice = ingredientes.indice() if ingredientes is not None else None
+        with self._lock:
+            versao = (self.versao, indice.versao if indice is not None else None)
+            if self._grafo_versao != versao:
+                with etapa("grafo.construir"):
+                    self._grafo = GrafoReceitas({r["name"]: r for r in self._documentos.values()}, indice)
+                self._grafo_versao = versao
+            return self._grafo
@@ -0,0 +1,95 @@
+"""Simulações "e se" de preço sobre o catálogo inteiro.
+
+Um cenário é um conjunto de variações relativas de preço (0.18 = +18%) por
+ingrediente e por categoria, com um markup opcional. Todos os cenários são
+avaliados de uma vez com os vetores de ingredientes base já calculados pelo grafo:
+uma multiplicação de matrizes receitas × ingredientes × cenários.
+"""
+import numpy as np
+import pandas as pd
+
+from panela.ingredientes import normalizar_nome
+
+COL_CUSTO = "Custo (1 Porção)"
+COL_PRECO = "Preço Venda (1 Porção)"
+COL_MARGEM = "Margem (1 Porção)"
+
+
+def cenario(nome, ingredientes=None, categorias=None, markup=None):
+    """Cenário com variações por ingrediente ({nome ou id: variação}) e por categoria.
+
+    A categoria de um ingrediente é o campo `categoria` do seu documento no mestre.
+    """
+    return {"nome": nome, "ingredientes": dict(ingredientes or {}), "categorias": dict(categorias or {}), "markup": markup}
+
+
+def variar_markup(inicio, fim, passo, base=None):
+    """Um cenário por markup de `inicio` a `fim` (inclusive), sobre as variações de `base`."""
+    base = base or cenario("Markup")
+    passos = int(round((fim - inicio) / passo)) + 1
+    return [{**base, "nome": f"{base['nome']} {m:.2f}x", "markup": float(round(m, 6))} for m in inicio + passo * np.arange(passos)]
+
+
+def _indices(matriz, mestre):
+    indice = mestre.indice() if mestre is not None else None
+    por_nome, por_categoria = {}, {}
+    for j, (chave, nome) in enumerate(zip(matriz["chaves"], matriz["nomes"])):
+        por_nome.setdefault(normalizar_nome(nome), set()).add(j)
+        if isinstance(chave, str):
+            por_nome.setdefault(chave, set()).add(j)
+            doc = indice.obter(chave) if indice is not None else None
+            if doc and doc.get("categoria"):
+                por_categoria.setdefault(normalizar_nome(doc["categoria"]), set()).add(j)
+    return por_nome, por_categoria
+
+
+def fatores_preco(matriz, cenarios, mestre=None):
+    """Matriz chaves × cenários com o multiplicador do preço de cada ingrediente base.
+
+    Variações por ingrediente e por categoria acumulam-se: (1 + a) × (1 + b).
+    """
+    por_nome, por_categoria = _indices(matriz, mestre)
+    fatores = np.ones((len(matriz["chaves"]), len(cenarios)))
+    for s, c in enumerate(cenarios):
+        for alvos, indice, tipo in ((c.get("ingredientes", {}), por_nome, "Ingrediente desconhecido"), (c.get("categorias", {}), por_categoria, "Categoria desconhecida")):
+            for alvo, variacao in alvos.items():
+                colunas = indice.get(alvo) or indice.get(normalizar_nome(alvo))
+                if not colunas:
+                    raise ValueError(f"{tipo} no cenário '{c['nome']}': {alvo}")
+                fatores[list(colunas), s] *= 1 + variacao
+    return fatores
+
+
+def avaliar_cenarios(grafo, cenarios, mestre=None, markup=3.0, precos_venda=None):
+    """Custo, preço de venda e margem por porção de cada receita em cada cenário.
+
+    Devolve um DataFrame com uma linha por receita e colunas (métrica, cenário).
+    O preço é o custo do cenário × o seu markup; num cenário sem markup, a receita
+    mantém o preço atual de `precos_venda` ({nome: preço por porção}) ou, sem ele,
+    leva o `markup` por omissão.
+    """
+    matriz = grafo.matriz()
+    fatores = fatores_preco(matriz, cenarios, mestre)
+    custo = matriz["quantidades"] @ (matriz["custo_unitario"][:, None] * fatores) / matriz["rendimentos"][:, None]
+
+    markups = np.array([c.get("markup") or np.nan for c in cenarios], dtype=float)
+    precos_venda = precos_venda or {}
+    preco_fixo = np.array([precos_venda.get(nome, np.nan) for nome in matriz["receitas"]], dtype=float)
+    sem_markup = np.where(np.isnan(preco_fixo)[:, None], custo * markup, preco_fixo[:, None])
+    preco = np.where(np.isnan(markups)[None, :], sem_markup, custo * markups[None, :])
+
+    colunas = pd.MultiIndex.from_product(
+        [[COL_CUSTO, COL_PRECO, COL_MARGEM], [c["nome"] for c in cenarios]], names=["Métrica", "Cenário"]
+    )
+    return pd.DataFrame(
+        np.concatenate([custo, preco, preco - custo], axis=1),
+        index=pd.Index(matriz["receitas"], name="Receita"), columns=colunas,
+    )
+
+
+def tabela_longa(resultado):
+    """Uma linha por receita e cenário, para CSV/Parquet."""
+    longa = resultado[COL_CUSTO].melt(ignore_index=False, value_name=COL_CUSTO).reset_index()
+    for coluna in (COL_PRECO, COL_MARGEM):
+        longa[coluna] = resultado[coluna].melt()["value"].to_numpy()
+    return longa
@@ -0,0 +1,200 @@
+"""Linha de comandos da Panela de Controle, sem Streamlit.
+
+    python -m panela planear --todos --saida semana/ --formato parquet
+    python -m panela planear encomenda_de_sabado feira_de_domingo --processos 4
+    python -m panela cenarios --ingrediente manteiga=18 --categoria laticinios=10 --markup 2.5:3.5:0.1
+    python -m panela exportar catalogo --formato xlsx --saida catalogo.xlsx
+    python -m panela importar precos fornecedor.xlsx --simular --rejeitadas rejeitadas.csv
+    python -m panela --metricas metricas.jsonl exportar receitas
+
+O backend escolhe-se como na página: PANELA_BACKEND=sqlite (ficheiro em
+PANELA_SQLITE) ou Firestore com a chave de serviço em firebase_key.json.
+"""
+import argparse
+import os
+import sys
+import time
+
+from panela.armazenamento import FirestoreArmazenamento, SQLiteArmazenamento
+from panela.cenarios import avaliar_cenarios, cenario, tabela_longa, variar_markup
+from panela.exportacao import ESCRITORES, em_partes, exportar, linhas_catalogo, linhas_receitas
+from panela.importacao import importar_precos, importar_receitas, ler_linhas
+from panela.instrumentacao import ArmazenamentoMedido, Medidor, etapa
+from panela.lote import planear_em_lote, retrato_catalogo, tabelas_lote
+from panela.servico import ServicoPanela, id_planeamento
+
+FORMATOS = ("csv", "parquet")
+NOMES_COLECOES = {"recipes": "receita(s)", "ingredients": "ingrediente(s)"}
+
+
+def conectar(backend=None, sqlite=None, credenciais=None):
+    backend = backend or os.environ.get("PANELA_BACKEND", "firestore")
+    if backend == "sqlite":
+        return ArmazenamentoMedido(SQLiteArmazenamento(sqlite or os.environ.get("PANELA_SQLITE", "panela.db")))
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(credenciais or "firebase_key.json"))
+    return ArmazenamentoMedido(FirestoreArmazenamento(firestore.client()))
+
+
+def gravar_tabela(df, caminho, formato):
+    if formato == "parquet":
+        df.to_parquet(caminho, index=False)
+    else:
+        df.to_csv(caminho, index=False, sep=';', decimal=',', encoding='utf-8-sig')
+
+
+# --- COMANDOS ---
+def comando_planear(args):
+    armazenamento = conectar(args.backend, args.sqlite, args.credenciais)
+    servico = ServicoPanela(armazenamento)
+    if args.todos:
+        planos = armazenamento.listar("productions")
+    else:
+        ids = [id_planeamento(p) for p in args.planos]
+        encontrados = armazenamento.obter("productions", ids)
+        em_falta = [p for p, doc_id in zip(args.planos, ids) if doc_id not in encontrados]
+        if em_falta:
+            sys.exit(f"Planeamentos não encontrados: {', '.join(em_falta)}")
+        planos = [encontrados[doc_id] for doc_id in ids]
+    if not planos:
+        sys.exit("Nenhum planeamento para processar.")
+
+    inicio = time.perf_counter()
+    resultados, combinado = planear_em_lote(planos, retrato_catalogo(servico), args.markup, args.processos)
+    tabelas = tabelas_lote(resultados, combinado)
+
+    os.makedirs(args.saida, exist_ok=True)
+    for nome, df in tabelas.items():
+        gravar_tabela(df, os.path.join(args.saida, f"{nome}.{args.formato}"), args.formato)
+
+    for r in resultados:
+        if r["em_falta"]:
+            print(f"⚠️ {r['plano']}: {len(r['em_falta'])} receita(s) já não existem e foram ignoradas.", file=sys.stderr)
+    print(tabelas["resumo"].to_string(index=False, float_format="{:.2f}".format))
+    print(f"\n{len(planos)} planeamento(s) em {time.perf_counter() - inicio:.2f}s → {args.saida}")
+
+
+def _variacao(texto):
+    alvo, _, percentagem = texto.rpartition("=")
+    if not alvo:
+        raise argparse.ArgumentTypeError(f"use NOME=PERCENTAGEM, não '{texto}'")
+    return alvo, float(percentagem.rstrip("%")) / 100
+
+
+def _intervalo(texto):
+    partes = [float(p) for p in texto.split(":")]
+    if len(partes) == 1:
+        partes = partes * 2 + [1.0]
+    if len(partes) != 3 or partes[2] <= 0:
+        raise argparse.ArgumentTypeError(f"use INICIO:FIM:PASSO, não '{texto}'")
+    return partes
+
+
+def comando_cenarios(args):
+    servico = ServicoPanela(conectar(args.backend, args.sqlite, args.credenciais))
+    cenarios = [cenario("Atual")]
+    cenarios += [cenario(f"{alvo} {v:+.0%}", ingredientes={alvo: v}) for alvo, v in args.ingrediente]
+    cenarios += [cenario(f"{alvo} {v:+.0%}", categorias={alvo: v}) for alvo, v in args.categoria]
+    if args.markup:
+        cenarios += variar_markup(*args.markup)
+    inicio = time.perf_counter()
+    try:
+        resultado = avaliar_cenarios(servico.grafo(), cenarios, servico.mestre, args.markup_base)
+    except ValueError as erro:
+        sys.exit(str(erro))
+    segundos = time.perf_counter() - inicio
+    gravar_tabela(tabela_longa(resultado), args.saida, args.formato)
+    print(f"{resultado.shape[0]} receitas × {len(cenarios)} cenários em {segundos:.3f}s → {args.saida}")
+
+
+def comando_exportar(args):
+    servico = ServicoPanela(conectar(args.backend, args.sqlite, args.credenciais))
+    fonte = {"catalogo": linhas_catalogo, "receitas": linhas_receitas}[args.tabela]
+    saida = args.saida or f"{args.tabela}.{args.formato}"
+    inicio = time.perf_counter()
+    exportar(em_partes(fonte(servico.catalogo, servico.grafo()), args.tamanho_parte), args.formato, saida)
+    print(f"{args.tabela} em {time.perf_counter() - inicio:.2f}s → {saida}")
+
+
+def comando_importar(args):
+    servico = ServicoPanela(conectar(args.backend, args.sqlite, args.credenciais))
+    importar = {"receitas": importar_receitas, "precos": importar_precos}[args.tipo]
+    inicio = time.perf_counter()
+    try:
+        relatorio = importar(servico, ler_linhas(args.ficheiro), simular=args.simular)
+    except ValueError as erro:
+        sys.exit(str(erro))
+    importados = ", ".join(f"{n} {NOMES_COLECOES[colecao]}" for colecao, n in relatorio["importados"].items())
+    prefixo = "Simulação: seriam importados" if args.simular else "Importados"
+    print(f"{prefixo} {importados} de {relatorio['linhas_lidas']} linha(s) em {time.perf_counter() - inicio:.2f}s.")
+    if relatorio["receitas_recalculadas"]:
+        print(f"Custo recalculado em {relatorio['receitas_recalculadas']} receita(s).")
+    if relatorio["rejeitadas"]:
+        print(f"{len(relatorio['rejeitadas'])} linha(s) rejeitada(s).", file=sys.stderr)
+        if args.rejeitadas:
+            exportar(em_partes(relatorio["rejeitadas"]), "csv", args.rejeitadas)
+        else:
+            for r in relatorio["rejeitadas"]:
+                print(f"  linha {r['linha']}: {r['motivo']}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m panela", description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("firestore", "sqlite"), help="por omissão, PANELA_BACKEND")
+    parser.add_argument("--sqlite", help="ficheiro da base SQLite (por omissão, PANELA_SQLITE ou panela.db)")
+    parser.add_argument("--credenciais", help="chave de serviço do Firebase (por omissão, firebase_key.json)")
+    parser.add_argument("--metricas", metavar="FICHEIRO",
+                        help="acrescenta tempos por etapa e documentos lidos/gravados a um ficheiro JSONL")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    planear = comandos.add_parser("planear", help="precifica e consolida vários planeamentos guardados")
+    planear.add_argument("planos", nargs="*", help="nomes ou IDs dos planeamentos")
+    planear.add_argument("--todos", action="store_true", help="todos os planeamentos guardados")
+    planear.add_argument("--markup", type=float, default=3.0, help="markup para itens sem preço de venda")
+    planear.add_argument("--processos", type=int, help="processos em paralelo (por omissão, um por CPU)")
+    planear.add_argument("--formato", choices=FORMATOS, default="csv")
+    planear.add_argument("--saida", default="planeamento", help="pasta de saída")
+    planear.set_defaults(funcao=comando_planear)
+
+    cenarios = comandos.add_parser("cenarios", help="custo, preço e margem de todo o catálogo em vários cenários")
+    cenarios.add_argument("--ingrediente", type=_variacao, action="append", default=[], metavar="NOME=PCT",
+                          help="variação de preço de um ingrediente, ex.: manteiga=18 (repetível)")
+    cenarios.add_argument("--categoria", type=_variacao, action="append", default=[], metavar="NOME=PCT",
+                          help="variação de preço de uma categoria do mestre, ex.: laticinios=10 (repetível)")
+    cenarios.add_argument("--markup", type=_intervalo, metavar="INICIO:FIM:PASSO", help="um cenário por markup")
+    cenarios.add_argument("--markup-base", type=float, default=3.0, help="markup dos cenários de variação de preço")
+    cenarios.add_argument("--formato", choices=FORMATOS, default="csv")
+    cenarios.add_argument("--saida", default="cenarios.csv", help="ficheiro de saída")
+    cenarios.set_defaults(funcao=comando_cenarios)
+
+    exportar_ = comandos.add_parser("exportar", help="exporta o catálogo em partes, sem o carregar inteiro em memória")
+    exportar_.add_argument("tabela", choices=("catalogo", "receitas"),
+                           help="catalogo: ingredientes base de cada receita; receitas: custo por receita")
+    exportar_.add_argument("--formato", choices=list(ESCRITORES), default="csv")
+    exportar_.add_argument("--tamanho-parte", type=int, default=5000, help="linhas por bloco escrito")
+    exportar_.add_argument("--saida", help="ficheiro de saída (por omissão, <tabela>.<formato>)")
+    exportar_.set_defaults(funcao=comando_exportar)
+
+    importar = comandos.add_parser("importar", help="importa fichas técnicas ou uma tabela de preços (CSV ou XLSX)")
+    importar.add_argument("tipo", choices=("receitas", "precos"))
+    importar.add_argument("ficheiro")
+    importar.add_argument("--simular", action="store_true", help="só valida e mostra o relatório, sem gravar")
+    importar.add_argument("--rejeitadas", help="CSV com as linhas rejeitadas e o motivo")
+    importar.set_defaults(funcao=comando_importar)
+
+    args = parser.parse_args(argv)
+    if args.comando == "planear" and not args.planos and not args.todos:
+        parser.error("indique os planeamentos ou use --todos")
+    if not args.metricas:
+        args.funcao(args)
+        return
+    # Os processos do pool de `planear` não entram nas contagens, só no tempo total.
+    medidor = Medidor().ativar()
+    try:
+        with etapa(f"comando.{args.comando}"):
+            args.funcao(args)
+    finally:
+        medidor.gravar_jsonl(args.metricas, comando=args.comando)
@@ -0,0 +1,60 @@
+from panela.pacotes import otimizar_pacotes
+
+
+def consolidar(ingredientes_por_item):
+    """Soma as linhas base de todos os itens da fila por ingrediente.
+
+    Devolve {chave: {...}} com a necessidade total e o custo proporcional, e o
+    custo proporcional total (o valor só das gramas efetivamente usadas).
+    """
+    consolidados = {}
+    custo_proporcional_total = 0
+    for linhas in ingredientes_por_item:
+        for ing in linhas:
+            dados = consolidados.get(ing['chave'])
+            if dados is None:
+                dados = consolidados[ing['chave']] = {
+                    "nome": ing['nome'], "ingrediente_id": ing['ingrediente_id'], "qtd_total": 0,
+                    "tam_pacote": ing['tam_pacote'], "preco_compra": ing['preco_compra'], "unidade": ing['unidade'],
+                    "custo_prop_acumulado": 0
+                }
+            dados["qtd_total"] += ing['qtd_usada']
+            dados["custo_prop_acumulado"] += ing['custo_final']
+            custo_proporcional_total += ing['custo_final']
+    return consolidados, custo_proporcional_total
+
+
+def lista_compras(consolidados, mestre=None):
+    """Pacotes a comprar por ingrediente e o desembolso de caixa total.
+
+    Com o mestre, cada ingrediente pode ter vários tamanhos à venda e fica com a
+    combinação mais barata que cobre a necessidade; sem ele, só o pacote da linha.
+    """
+    indice = mestre.indice() if mestre is not None else None
+    itens, desembolso_total = [], 0
+    for dados in consolidados.values():
+        doc = indice.obter(dados['ingrediente_id']) if indice is not None and dados['ingrediente_id'] else None
+        skus = mestre.skus(doc) if doc else [(dados['tam_pacote'], dados['preco_compra'])]
+        custo, contagens = otimizar_pacotes(dados['qtd_total'], skus)
+        desembolso_total += custo
+        itens.append({
+            **dados, "desembolso": custo,
+            "pacotes": [(tam, preco, n) for n, (tam, preco) in zip(contagens, skus) if n],
+            "tam_referencia": skus[0][0],
+        })
+    return itens, desembolso_total
+
+
+def formatar_lista_compras(itens):
+    """Linhas da tabela "Lista de Compras Otimizada", como aparecem no ecrã e no CSV."""
+    linhas = []
+    for item in itens:
+        unidade = item['unidade']
+        compra = " + ".join(f"{n}x ({tam:g}{unidade})" for tam, _, n in item['pacotes'])
+        linhas.append({
+            "Ingrediente": item['nome'],
+            "Necessidade Real": f"{item['qtd_total']:.1f} {unidade}",
+            "Comprar (Pacotes)": compra or f"0x ({item['tam_referencia']:g}{unidade})",
+            "Desembolso Caixa": f"R$ {item['desembolso']:.2f}"
+        })
+    return linhas
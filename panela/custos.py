@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from panela.unidades import CONVERSOES
+
+COLUNAS_EDITOR = ["Tipo", "Nome", "Preco_Pacote", "Tam_Pacote", "Medida", "Qtd_Usada"]
+COLUNAS_NUMERICAS = ["Preco_Pacote", "Tam_Pacote", "Qtd_Usada"]
+
+COL_FORNADAS = "✏️ Fornadas"
+COL_PRECO_VENDA = "✏️ Preço Venda (1 Porção)"
+
+FATORES = {unidade: fator for unidade, (_, fator) in CONVERSOES.items()}
+UNIDADES_BASE = {unidade: base for unidade, (base, _) in CONVERSOES.items()}
+
+
+def normalizar_unidades(unidades, *quantidades):
+    """Versão colunar de `normalizar_unidade`: kg→g e L→ml em todas as `quantidades`."""
+    unidades = pd.Series(unidades, copy=False)
+    fator = unidades.map(FATORES).fillna(1.0).to_numpy(dtype=float)
+    base = unidades.replace(UNIDADES_BASE)
+    return (base, *(np.asarray(q, dtype=float) * fator for q in quantidades))
+
+
+def custear_linhas(df):
+    """Linhas válidas do editor de ficha técnica, já no formato gravado em `ingredients`."""
+    linhas = df[COLUNAS_EDITOR].copy()
+    linhas[COLUNAS_NUMERICAS] = linhas[COLUNAS_NUMERICAS].apply(pd.to_numeric, errors='coerce')
+    linhas = linhas.dropna(how='any')
+    linhas = linhas[linhas['Tam_Pacote'] > 0]
+
+    _, qtd, tam = normalizar_unidades(linhas['Medida'], linhas['Qtd_Usada'], linhas['Tam_Pacote'])
+    nomes = linhas['Nome'].astype(str)
+    eh_ingrediente = linhas['Tipo'] == 'Ingrediente'
+    return pd.DataFrame({
+        "tipo": linhas['Tipo'],
+        "nome": nomes.str.strip().str.title().where(eh_ingrediente, linhas['Nome']),
+        "preco_compra": linhas['Preco_Pacote'].astype(float),
+        "tam_pacote": linhas['Tam_Pacote'].astype(float),
+        "unidade": linhas['Medida'],
+        "qtd_usada": linhas['Qtd_Usada'].astype(float),
+        "custo_final": linhas['Preco_Pacote'].to_numpy(dtype=float) / tam * qtd,
+    })
+
+
+def custear_alteracoes(df, anterior=None, custeadas=None):
+    """`custear_linhas(df)` recalculando só as linhas que mudaram desde `anterior`.
+
+    `custeadas` é o resultado para `anterior`. As linhas comparam-se por posição e o
+    resultado vem indexado pela posição da linha em `df`.
+    """
+    df = df[COLUNAS_EDITOR].reset_index(drop=True)
+    if anterior is None or custeadas is None:
+        return custear_linhas(df)
+    anterior = anterior[COLUNAS_EDITOR].reset_index(drop=True).reindex(df.index)
+    iguais = ((df == anterior) | (df.isna() & anterior.isna())).all(axis=1).to_numpy()
+    mantidas = custeadas[custeadas.index.isin(df.index[iguais])]
+    if iguais.all():
+        return mantidas
+    novas = custear_linhas(df[~iguais])
+    return novas if mantidas.empty else pd.concat([mantidas, novas]).sort_index()
+
+
+def tabela_precificacao(produtos, lotes, rendimentos, custos_fornada, precos_venda, markup):
+    """Tabela de produção e precificação calculada coluna a coluna.
+
+    `precos_venda` aceita None/NaN nas linhas sem preço definido; essas recebem
+    `custo da porção × markup`.
+    """
+    lotes = np.asarray(lotes, dtype=float)
+    porcoes = lotes * np.asarray(rendimentos, dtype=float)
+    custo_total = np.asarray(custos_fornada, dtype=float) * lotes
+    custo_porcao = np.divide(custo_total, porcoes, out=np.zeros_like(custo_total), where=porcoes > 0)
+    precos = np.array([np.nan if p is None else p for p in precos_venda], dtype=float)
+    precos = np.where(np.isnan(precos), custo_porcao * markup, precos)
+    markup_real = np.divide(precos, custo_porcao, out=np.zeros_like(precos), where=custo_porcao > 0)
+    return pd.DataFrame({
+        "Produto": list(produtos),
+        COL_FORNADAS: lotes,
+        "Rende (Porções)": porcoes,
+        "Custo (1 Porção)": custo_porcao,
+        COL_PRECO_VENDA: precos,
+        "Markup Atual": pd.Series(markup_real).map("{:.2f}x".format),
+        "Lucro Projetado (Total)": precos * porcoes - custo_total,
+    })
+
+
+def precificar_fila(fila, grafo, markup):
+    """`tabela_precificacao` de uma fila de produção ({"receita", "qtd", "preco_venda_porcao"})."""
+    return tabela_precificacao(
+        produtos=[item['receita']['name'] for item in fila],
+        lotes=[item['qtd'] for item in fila],
+        rendimentos=[item['receita'].get('rendimento', 1.0) for item in fila],
+        custos_fornada=[grafo.custo_fornada(item['receita']) for item in fila],
+        precos_venda=[item.get('preco_venda_porcao') for item in fila],
+        markup=markup
+    )
+
+
+def faturamento_projetado(fila):
+    return sum(item['preco_venda_porcao'] * item['qtd'] * item['receita'].get('rendimento', 1.0) for item in fila)
+
+
+def linhas_para_editor(ingredientes):
+    """Linhas gravadas em `ingredients` no formato das colunas do editor."""
+    df_temp = pd.DataFrame(ingredientes)
+    if df_temp.empty:
+        return pd.DataFrame(columns=COLUNAS_EDITOR)
+    return pd.DataFrame({
+        "Tipo": df_temp['tipo'] if 'tipo' in df_temp.columns else 'Ingrediente',
+        "Nome": df_temp['nome'],
+        "Preco_Pacote": df_temp['preco_compra'],
+        "Tam_Pacote": df_temp['tam_pacote'],
+        "Medida": df_temp['unidade'],
+        "Qtd_Usada": df_temp['qtd_usada'],
+    })
+
+
+def linhas_alteradas(editado, original):
+    """Máscara das linhas em que o utilizador mudou fornadas ou preço de venda."""
+    mudou = np.zeros(len(original), dtype=bool)
+    for coluna in (COL_FORNADAS, COL_PRECO_VENDA):
+        novo = editado[coluna].to_numpy(dtype=float)
+        antigo = original[coluna].to_numpy(dtype=float)
+        mudou |= (novo != antigo) & ~(np.isnan(novo) & np.isnan(antigo))
+    return mudou
@@ -0,0 +1,128 @@
+"""Exportações em partes: as linhas saem de iteradores e são escritas bloco a bloco.
+
+Nenhum formato precisa da tabela inteira em memória. CSV segue a convenção da
+página (sep=';', decimal=',', UTF-8 com BOM para o Excel); XLSX usa o modo
+write_only do openpyxl e Parquet o ParquetWriter do pyarrow, ambos opcionais.
+"""
+import tempfile
+from itertools import islice
+
+import pandas as pd
+
+TAMANHO_PARTE = 5000
+# Acima disto o ficheiro temporário passa da memória para o disco.
+LIMITE_MEMORIA = 16 * 1024 * 1024
+
+MIME = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def em_partes(linhas, tamanho=TAMANHO_PARTE):
+    """DataFrames de até `tamanho` linhas a partir de um iterador de dicts."""
+    linhas = iter(linhas)
+    while True:
+        bloco = list(islice(linhas, tamanho))
+        if not bloco:
+            return
+        yield pd.DataFrame(bloco)
+
+
+# --- FONTES ---
+def linhas_receitas(catalogo, grafo):
+    """Uma linha por receita: rendimento e custo da fornada e da porção."""
+    for rec in catalogo.listar():
+        if grafo.ciclo_de(rec['name']):
+            continue
+        rendimento = max(rec.get('rendimento', 1.0), 0.01)
+        custo = grafo.custo_fornada(rec)
+        yield {
+            "Receita": rec['name'], "Autor": rec.get('author', ''), "Rende (Porções)": rendimento,
+            "Custo Fornada": custo, "Custo (1 Porção)": custo / rendimento,
+        }
+
+
+def linhas_catalogo(catalogo, grafo):
+    """Cada receita achatada nos seus ingredientes base, para uma fornada."""
+    for rec in catalogo.listar():
+        if grafo.ciclo_de(rec['name']):
+            continue
+        for ing in grafo.expandir(rec, 1):
+            yield {
+                "Receita": rec['name'], "Ingrediente": ing['nome'], "Unidade": ing['unidade'],
+                "Qtd Usada": ing['qtd_usada'], "Preço Pacote": ing['preco_compra'],
+                "Tam Pacote": ing['tam_pacote'], "Custo": ing['custo_final'],
+            }
+
+
+# --- ESCRITORES ---
+def escrever_csv(partes, destino):
+    destino.write(b"\xef\xbb\xbf")
+    for i, parte in enumerate(partes):
+        destino.write(parte.to_csv(index=False, header=i == 0, sep=';', decimal=',').encode('utf-8'))
+
+
+def escrever_xlsx(partes, destino, folha="Dados"):
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet(folha)
+    for i, parte in enumerate(partes):
+        if i == 0:
+            planilha.append(list(parte.columns))
+        for linha in parte.astype(object).where(parte.notna(), None).to_numpy().tolist():
+            planilha.append(linha)
+    livro.save(destino)
+
+
+def escrever_parquet(partes, destino):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for parte in partes:
+            # O esquema vem do primeiro bloco; os seguintes são convertidos para ele.
+            tabela = pa.Table.from_pandas(parte, schema=escritor.schema if escritor else None, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabela.schema)
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+ESCRITORES = {"csv": escrever_csv, "xlsx": escrever_xlsx, "parquet": escrever_parquet}
+
+
+def exportar(partes, formato, destino=None):
+    """Escreve as `partes` em `destino` (ficheiro binário ou caminho).
+
+    Sem destino, escreve num ficheiro temporário que fica em memória até
+    LIMITE_MEMORIA e devolve-o já rebobinado, pronto para o `download_button`.
+    """
+    if destino is None:
+        destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA)
+        ESCRITORES[formato](partes, destino)
+        destino.seek(0)
+        return destino
+    if isinstance(destino, str):
+        with open(destino, "wb") as ficheiro:
+            ESCRITORES[formato](partes, ficheiro)
+        return destino
+    ESCRITORES[formato](partes, destino)
+    return destino
+
+
+def para_download(fonte, formato):
+    """Callable para o `data` do `st.download_button`: o ficheiro só é gerado quando o utilizador clica.
+
+    `fonte` é chamada nesse momento, fora da execução da página, e devolve as partes.
+    Um `data` callable precisa do Streamlit 1.52 ou mais recente (ver requirements.txt).
+    """
+    def gerar():
+        with exportar(fonte(), formato) as ficheiro:
+            return ficheiro.read()
+    return gerar
@@ -0,0 +1,243 @@
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+from panela.instrumentacao import contar
+from panela.unidades import TAMANHO_MINIMO, normalizar_unidade
+
+
+def id_ingrediente(nome):
+    """ID canónico do mestre de ingredientes: "Farinha  de Trigo" e "farinha de trigo" dão o mesmo documento."""
+    sem_acentos = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return "_".join(sem_acentos.lower().split())
+
+
+def eh_sub_receita(ing):
+    return ing.get('tipo', 'Ingrediente') == 'Sub-receita'
+
+
+class ErroCicloReceitas(ValueError):
+    def __init__(self, ciclo):
+        self.ciclo = list(ciclo)
+        super().__init__("Ciclo de sub-receitas: " + " → ".join(self.ciclo))
+
+
+class GrafoReceitas:
+    """Grafo de receitas ligado pelas linhas `Sub-receita`.
+
+    Ordena as receitas topologicamente (sub-receitas primeiro) e guarda, para cada
+    uma, o vetor de ingredientes base de UMA fornada. "N fornadas de X" passa a
+    ser só escalar esse vetor, por mais fundas e partilhadas que sejam as bases.
+
+    Com o índice do mestre de `ingredientes` (`CatalogoIngredientes.indice()`), cada
+    linha base é ligada ao seu documento e custeada pelo preço do mestre; linhas sem
+    correspondência usam o próprio preço.
+    """
+
+    def __init__(self, receitas_por_nome, ingredientes=None):
+        self._receitas = receitas_por_nome
+        self._ingredientes = ingredientes
+        # chave do vetor -> (nome, unidade base, tam_pacote, preco_compra)
+        self._info = {}
+        self._filhos = {nome: self._arestas(rec) for nome, rec in receitas_por_nome.items()}
+        self.ordem, self._ciclos = self._ordenar()
+        self._posicao = {nome: i for i, nome in enumerate(self.ordem)}
+        # Índices inversos: quem usa cada sub-receita e cada ingrediente base.
+        self._pais = defaultdict(set)
+        self._usos = defaultdict(set)
+        for nome, rec in receitas_por_nome.items():
+            for filho, _ in self._filhos[nome]:
+                self._pais[filho].add(nome)
+            for ing in rec.get('ingredients', []):
+                if not eh_sub_receita(ing):
+                    self._usos[ing.get('ingrediente_id') or id_ingrediente(ing['nome'])].add(nome)
+        self._vetores = {}
+        self._custos = {}
+        for nome in self.ordem:
+            self._vetores[nome] = self._montar_vetor(self._receitas[nome]['ingredients'])
+            self._custos[nome] = self._custo_vetor(self._vetores[nome])
+        self.nos_expandidos = 0
+        self._matriz = None
+
+    def _arestas(self, receita):
+        arestas = []
+        for ing in receita.get('ingredients', []):
+            if eh_sub_receita(ing) and ing['nome'] in self._receitas:
+                tam_pacote = max(ing.get('tam_pacote', 1), TAMANHO_MINIMO)
+                arestas.append((ing['nome'], ing.get('qtd_usada', 0) / tam_pacote))
+        return arestas
+
+    def _ordenar(self):
+        # DFS iterativa em três cores: a pós-ordem dá a ordem topológica e uma aresta
+        # para um nó ainda "em visita" fecha um ciclo.
+        ordem, ciclos = [], {}
+        estado = {}
+        for raiz in self._receitas:
+            if raiz in estado:
+                continue
+            caminho = [raiz]
+            pilha = [(raiz, iter(self._filhos[raiz]))]
+            estado[raiz] = 'visitando'
+            while pilha:
+                nome, filhos = pilha[-1]
+                proximo = next(filhos, None)
+                if proximo is None:
+                    pilha.pop(); caminho.pop()
+                    estado[nome] = 'feito'
+                    if nome not in ciclos:
+                        # Quem depende de uma receita em ciclo também não pode ser expandido.
+                        em_ciclo = next((filho for filho, _ in self._filhos[nome] if filho in ciclos), None)
+                        if em_ciclo is None:
+                            ordem.append(nome)
+                        else:
+                            ciclos[nome] = ciclos[em_ciclo]
+                    continue
+                filho = proximo[0]
+                if estado.get(filho) == 'visitando':
+                    ciclo = caminho[caminho.index(filho):] + [filho]
+                    for membro in ciclo:
+                        ciclos.setdefault(membro, ciclo)
+                elif filho not in estado:
+                    estado[filho] = 'visitando'
+                    caminho.append(filho)
+                    pilha.append((filho, iter(self._filhos[filho])))
+        return ordem, ciclos
+
+    def _montar_vetor(self, ingredientes):
+        vetor = defaultdict(float)
+        for ing in ingredientes:
+            if eh_sub_receita(ing):
+                sub = ing['nome']
+                if sub in self._ciclos:
+                    raise ErroCicloReceitas(self._ciclos[sub])
+                if sub not in self._vetores:
+                    continue
+                fator = ing.get('qtd_usada', 0) / max(ing.get('tam_pacote', 1), TAMANHO_MINIMO)
+                for chave, qtd in self._vetores[sub].items():
+                    vetor[chave] += qtd * fator
+            else:
+                chave, qtd = self._chave_base(ing)
+                vetor[chave] += qtd
+        return dict(vetor)
+
+    def _chave_base(self, ing):
+        unidade, qtd, tam = normalizar_unidade(
+            ing.get('unidade', 'unid'), ing.get('qtd_usada', 0), max(ing.get('tam_pacote', 1), TAMANHO_MINIMO)
+        )
+        mestre = self._ingredientes.resolver(ing) if self._ingredientes is not None else None
+        if mestre is not None:
+            unidade_mestre, _, tam_mestre = normalizar_unidade(mestre['unidade'], 0, max(mestre['tam_pacote'], TAMANHO_MINIMO))
+            if unidade_mestre == unidade:
+                self._info[mestre['id']] = (mestre['nome'], unidade, tam_mestre, mestre['preco_compra'])
+                return mestre['id'], qtd
+        chave = (ing['nome'], unidade, tam, ing.get('preco_compra', 0))
+        self._info[chave] = chave
+        return chave, qtd
+
+    def _custo_vetor(self, vetor):
+        total = 0.0
+        for chave, qtd in vetor.items():
+            _, _, tam, preco = self._info[chave]
+            total += preco / tam * qtd
+        return total
+
+    # --- CONSULTAS ---
+    def __contains__(self, nome):
+        return nome in self._receitas
+
+    def ciclo_de(self, nome):
+        return self._ciclos.get(nome)
+
+    def vetor(self, receita):
+        nome = receita['name']
+        if nome in self._ciclos:
+            raise ErroCicloReceitas(self._ciclos[nome])
+        if self._receitas.get(nome) is receita:
+            return self._vetores[nome]
+        # Receita fora do catálogo (ou cópia antiga guardada na fila): monta só o topo.
+        return self._montar_vetor(receita.get('ingredients', []))
+
+    def custo_fornada(self, receita):
+        if self._receitas.get(receita['name']) is receita and receita['name'] in self._custos:
+            return self._custos[receita['name']]
+        return self._custo_vetor(self.vetor(receita))
+
+    def expandir(self, receita, lotes):
+        """Ingredientes base de `lotes` fornadas de `receita`, em g/ml/unid."""
+        linhas = []
+        for chave, qtd in self.vetor(receita).items():
+            nome, unidade, tam, preco = self._info[chave]
+            qtd_total = qtd * lotes
+            linhas.append({
+                "tipo": "Ingrediente", "nome": nome, "chave": chave if isinstance(chave, str) else f"{nome}|{unidade}|{tam:g}",
+                "ingrediente_id": chave if isinstance(chave, str) else None, "preco_compra": preco, "tam_pacote": tam,
+                "unidade": unidade, "qtd_usada": qtd_total, "custo_final": preco / tam * qtd_total
+            })
+        self.nos_expandidos += len(linhas)
+        contar("nos_expandidos", len(linhas))
+        return linhas
+
+    def matriz(self):
+        """O catálogo inteiro em NumPy, para avaliar muitos cenários de preço de uma vez.
+
+        `quantidades[i, j]` é a quantidade base da chave j numa fornada da receita i e
+        `custo_unitario[j]` o preço por g/ml/unid; `quantidades @ custo_unitario` dá o
+        custo de uma fornada de cada receita. Receitas em ciclo ficam de fora.
+        """
+        if self._matriz is None:
+            receitas = list(self.ordem)
+            chaves = list(self._info)
+            coluna = {chave: j for j, chave in enumerate(chaves)}
+            quantidades = np.zeros((len(receitas), len(chaves)))
+            for i, nome in enumerate(receitas):
+                for chave, qtd in self._vetores[nome].items():
+                    quantidades[i, coluna[chave]] = qtd
+            self._matriz = {
+                "receitas": receitas,
+                "chaves": chaves,
+                "nomes": [self._info[chave][0] for chave in chaves],
+                "quantidades": quantidades,
+                "custo_unitario": np.array([self._info[c][3] / self._info[c][2] for c in chaves], dtype=float),
+                "rendimentos": np.array([max(self._receitas[n].get('rendimento', 1.0), 0.01) for n in receitas], dtype=float),
+            }
+        return self._matriz
+
+    def usos_ingrediente(self, nome):
+        return set(self._usos.get(nome, ()))
+
+    def ancestrais(self, nomes):
+        """`nomes` e todas as receitas que dependem deles, sub-receitas antes das receitas-mãe.
+
+        Receitas presas em ciclos ficam de fora: não têm custo calculável.
+        """
+        vistos = set()
+        pendentes = [n for n in nomes if n in self._receitas]
+        while pendentes:
+            nome = pendentes.pop()
+            if nome in vistos:
+                continue
+            vistos.add(nome)
+            pendentes.extend(self._pais.get(nome, ()))
+        return sorted((n for n in vistos if n in self._posicao), key=self._posicao.__getitem__)
+
+    def verificar_sem_ciclo(self, nome, ingredientes):
+        """Levanta ErroCicloReceitas se gravar `nome` com estes ingredientes fechar um ciclo."""
+        for ing in ingredientes:
+            if not eh_sub_receita(ing):
+                continue
+            caminho = self._caminho(ing['nome'], nome, {})
+            if caminho is not None:
+                raise ErroCicloReceitas([nome] + caminho)
+
+    def _caminho(self, origem, destino, vistos):
+        if origem == destino:
+            return [origem]
+        if origem in vistos or origem not in self._filhos:
+            return None
+        vistos[origem] = True
+        for filho, _ in self._filhos[origem]:
+            resto = self._caminho(filho, destino, vistos)
+            if resto is not None:
+                return [origem] + resto
+        return None
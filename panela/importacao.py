@@ -0,0 +1,315 @@
+"""Importação em massa de fichas técnicas e de tabelas de preços de fornecedores.
+
+As folhas são lidas linha a linha (CSV com `csv`, XLSX com o modo read_only do
+openpyxl), validadas contra as opções do editor e gravadas em lote pelo
+armazenamento (no Firestore, commits de até 500 operações). Uma linha inválida
+rejeita a receita inteira, para nunca gravar uma ficha técnica incompleta.
+"""
+import csv
+import io
+import os
+import re
+
+import pandas as pd
+
+from panela.custos import COLUNAS_EDITOR, custear_linhas
+from panela.grafo import GrafoReceitas, id_ingrediente
+from panela.ingredientes import CatalogoIngredientes
+from panela.servico import id_receita
+from panela.unidades import MEDIDAS
+
+TIPOS = ("Ingrediente", "Sub-receita")
+MEDIDAS_SUB_RECEITA = ("porções", "receita")
+# Os cabeçalhos são comparados sem acentos nem maiúsculas: "Preço Pacote" = "preco_pacote".
+COLUNAS_RECEITAS = ("receita", "nome", "qtd_usada")
+COLUNAS_PRECOS = ("nome", "preco_pacote", "tam_pacote", "medida")
+
+
+class DialetoPanela(csv.excel):
+    # A convenção das exportações: ponto e vírgula (e vírgula decimal).
+    delimiter = ";"
+
+
+# --- LEITURA ---
+def ler_linhas(ficheiro, formato=None):
+    """(número da linha, {coluna normalizada: valor}) de um CSV ou XLSX, sem carregar a folha inteira.
+
+    `ficheiro` é um caminho ou um ficheiro binário (ex.: o que vem do `st.file_uploader`).
+    """
+    formato = formato or os.path.splitext(getattr(ficheiro, "name", ficheiro))[1].lstrip(".").lower()
+    if formato == "xlsx":
+        yield from _linhas_xlsx(ficheiro)
+    else:
+        yield from _linhas_csv(ficheiro)
+
+
+def _linhas_csv(ficheiro):
+    binario = open(ficheiro, "rb") if isinstance(ficheiro, str) else ficheiro
+    try:
+        texto = io.TextIOWrapper(binario, encoding="utf-8-sig", newline="")
+        amostra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        except csv.Error:
+            dialeto = DialetoPanela
+        leitor = csv.reader(texto, dialeto)
+        cabecalho = [id_ingrediente(c) for c in next(leitor, [])]
+        for numero, valores in enumerate(leitor, start=2):
+            if any(v.strip() for v in valores):
+                yield numero, dict(zip(cabecalho, (v.strip() for v in valores)))
+        texto.detach()
+    finally:
+        if isinstance(ficheiro, str):
+            binario.close()
+
+
+def _linhas_xlsx(ficheiro):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("ler XLSX precisa do pacote openpyxl (pip install openpyxl)") from None
+
+    livro = load_workbook(ficheiro, read_only=True, data_only=True)
+    try:
+        linhas = livro.active.iter_rows(values_only=True)
+        cabecalho = [id_ingrediente(c) if c is not None else "" for c in next(linhas, ())]
+        for numero, valores in enumerate(linhas, start=2):
+            if any(v not in (None, "") for v in valores):
+                yield numero, {c: ("" if v is None else v) for c, v in zip(cabecalho, valores)}
+    finally:
+        livro.close()
+
+
+MOTIVO_NUMERO = "Valor numérico inválido (use vírgula decimal: 1250 ou 1,25, nunca 1.250)"
+# "1.250" sem vírgula tanto é mil duzentos e cinquenta (pt-BR) como 1,25: não se adivinha.
+_MILHARES_SEM_DECIMAL = re.compile(r"[1-9]\d{0,2}(\.\d{3})+")
+
+
+def _numero(valor):
+    """Aceita números do Excel e texto com vírgula decimal ("1.250,5"); recusa "1.250"."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).strip().replace("R$", "").replace(" ", "")
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    elif _MILHARES_SEM_DECIMAL.fullmatch(texto):
+        raise ValueError(f"valor ambíguo: {valor}")
+    return float(texto)
+
+
+def _faltam_colunas(linha, obrigatorias):
+    return [c for c in obrigatorias if c not in linha]
+
+
+# --- RECEITAS ---
+def _validar_linha_receita(linha):
+    """(linha no formato do editor, motivo da rejeição ou None)."""
+    tipo = str(linha.get("tipo") or "Ingrediente").strip()
+    if tipo not in TIPOS:
+        return None, f"Tipo inválido: {tipo}"
+    nome = str(linha.get("nome") or "").strip()
+    if not nome:
+        return None, "Nome em falta"
+    medida = str(linha.get("medida") or ("porções" if tipo == "Sub-receita" else "")).strip()
+    if medida not in MEDIDAS:
+        return None, f"Medida inválida: {medida or '(vazia)'}"
+    try:
+        qtd = _numero(linha.get("qtd_usada"))
+        preco = _numero(linha.get("preco_pacote")) if tipo == "Ingrediente" else 0.0
+        tam = _numero(linha.get("tam_pacote")) if tipo == "Ingrediente" else 1.0
+    except (TypeError, ValueError):
+        return None, MOTIVO_NUMERO
+    if qtd <= 0 or tam <= 0 or preco < 0:
+        return None, "Quantidades têm de ser positivas e o preço não pode ser negativo"
+    return {"Tipo": tipo, "Nome": nome, "Preco_Pacote": preco, "Tam_Pacote": tam, "Medida": medida, "Qtd_Usada": qtd}, None
+
+
+def importar_receitas(servico, linhas, simular=False):
+    """Importa fichas técnicas em formato longo: uma linha por ingrediente ou sub-receita.
+
+    Colunas: Receita, Autor, Rendimento e as do editor (Tipo, Nome, Preco_Pacote,
+    Tam_Pacote, Medida, Qtd_Usada). Nas sub-receitas, preço e pacote vêm do catálogo.
+    Devolve o relatório (ver `relatorio`).
+    """
+    rejeitadas, lidas = [], 0
+    receitas = {}
+    for numero, linha in linhas:
+        lidas += 1
+        if lidas == 1 and _faltam_colunas(linha, COLUNAS_RECEITAS):
+            raise ValueError(f"Colunas em falta: {', '.join(_faltam_colunas(linha, COLUNAS_RECEITAS))}")
+        nome_receita = str(linha.get("receita") or "").strip()
+        if not nome_receita:
+            rejeitadas.append({"linha": numero, "receita": "", "motivo": "Receita em falta"})
+            continue
+        receita = receitas.setdefault(nome_receita, {"autor": "", "rendimento": None, "linhas": [], "numeros": [], "motivo": None})
+        receita["autor"] = receita["autor"] or str(linha.get("autor") or "").strip()
+        if receita["rendimento"] is None and str(linha.get("rendimento") or "").strip():
+            try:
+                receita["rendimento"] = _numero(linha["rendimento"])
+            except ValueError:
+                rejeitadas.append({"linha": numero, "receita": nome_receita, "motivo": "Rendimento inválido"})
+                receita["motivo"] = receita["motivo"] or f"linha {numero} rejeitada"
+                continue
+        editor, motivo = _validar_linha_receita(linha)
+        if motivo:
+            rejeitadas.append({"linha": numero, "receita": nome_receita, "motivo": motivo})
+            receita["motivo"] = receita["motivo"] or f"linha {numero} rejeitada"
+            continue
+        receita["linhas"].append(editor)
+        receita["numeros"].append(numero)
+
+    catalogo = servico.catalogo.por_nome()
+    # Sub-receitas têm de existir no catálogo ou na própria folha, sem ciclos; rejeitar
+    # uma receita pode deixar outra sem sub-receita, por isso repete até estabilizar.
+    while True:
+        validas = {n: r for n, r in receitas.items() if not r["motivo"]}
+        novas = {}
+        for nome, receita in validas.items():
+            faltam = [
+                l["Nome"] for l in receita["linhas"]
+                if l["Tipo"] == "Sub-receita" and l["Nome"] not in validas and l["Nome"] not in catalogo
+            ]
+            if faltam:
+                receita["motivo"] = f"Sub-receita desconhecida: {', '.join(faltam)}"
+            elif not receita["linhas"]:
+                receita["motivo"] = "Receita sem ingredientes"
+            else:
+                novas[nome] = _esboco(nome, receita)
+        if len(novas) < len(validas):
+            continue
+        grafo = GrafoReceitas({**catalogo, **novas})
+        em_ciclo = [n for n in novas if grafo.ciclo_de(n)]
+        if not em_ciclo:
+            break
+        for nome in em_ciclo:
+            receitas[nome]["motivo"] = "Ciclo de sub-receitas: " + " → ".join(grafo.ciclo_de(nome))
+
+    for nome, receita in receitas.items():
+        if receita["motivo"]:
+            rejeitadas.extend(
+                {"linha": n, "receita": nome, "motivo": f"Receita rejeitada ({receita['motivo']})"}
+                for n in receita["numeros"]
+            )
+
+    ingredientes_alterados = {}
+    documentos = {}
+    for nome, dados in _documentos_receitas(validas, catalogo).items():
+        linhas_vinculadas, alterados = servico.mestre.vincular(dados["ingredients"], ingredientes_alterados)
+        ingredientes_alterados.update(alterados)
+        documentos[id_receita(nome, dados["author"])] = {**dados, "ingredients": linhas_vinculadas}
+
+    propagadas = 0
+    if not simular and documentos:
+        servico.gravar_ingredientes(ingredientes_alterados)
+        servico.armazenamento.gravar("recipes", documentos)
+        for doc_id, dados in documentos.items():
+            servico.catalogo.aplicar(doc_id, dados)
+        propagadas = servico.propagar_custos(list(validas), ingredientes_alterados)
+    return relatorio(lidas, {"recipes": len(documentos), "ingredients": len(ingredientes_alterados)}, rejeitadas, simular, propagadas)
+
+
+def _esboco(nome, receita):
+    # Só o necessário para o grafo encontrar ciclos, sem custear.
+    return {"name": nome, "ingredients": [
+        {"tipo": l["Tipo"], "nome": l["Nome"], "qtd_usada": l["Qtd_Usada"], "tam_pacote": l["Tam_Pacote"],
+         "unidade": l["Medida"], "preco_compra": l["Preco_Pacote"]}
+        for l in receita["linhas"]
+    ]}
+
+
+def _documentos_receitas(importadas, catalogo):
+    """Documentos de `recipes` das receitas aceites, com todas as linhas custeadas de uma vez."""
+    linhas, donos = [], []
+    for nome, receita in importadas.items():
+        for linha in receita["linhas"]:
+            if linha["Tipo"] == "Sub-receita":
+                if linha["Nome"] in importadas:
+                    # O custo de uma sub-receita importada só se sabe depois; a propagação acerta-o.
+                    rendimento = importadas[linha["Nome"]]["rendimento"] or 1.0
+                    linha = {**linha, "Preco_Pacote": 0.0, "Tam_Pacote": max(rendimento, 0.01)}
+                else:
+                    sub = catalogo[linha["Nome"]]
+                    linha = {**linha, "Preco_Pacote": sub.get("total_cost", 0), "Tam_Pacote": max(sub.get("rendimento", 1.0), 0.01)}
+            linhas.append(linha)
+            donos.append(nome)
+
+    ingredientes = {nome: [] for nome in importadas}
+    custeadas = custear_linhas(pd.DataFrame(linhas, columns=COLUNAS_EDITOR))
+    for i, ing in zip(custeadas.index, custeadas.to_dict('records')):
+        ingredientes[donos[i]].append(ing)
+    return {
+        nome: {
+            "name": nome,
+            "author": receita["autor"] or "Chef",
+            "rendimento": max(receita["rendimento"] or 1.0, 0.01),
+            "ingredients": ingredientes[nome],
+            "total_cost": sum(i['custo_final'] for i in ingredientes[nome]),
+        }
+        for nome, receita in importadas.items()
+    }
+
+
+# --- TABELA DE PREÇOS ---
+def importar_precos(servico, linhas, simular=False):
+    """Atualiza o mestre de ingredientes a partir de uma tabela de fornecedor.
+
+    Colunas: Nome, Preco_Pacote, Tam_Pacote, Medida e, opcional, Categoria. A folha
+    substitui os `skus` de cada ingrediente que traz: a primeira linha é o pacote
+    principal e as outras os tamanhos alternativos à venda. Um ingrediente com uma só
+    linha fica sem SKUs, para não se comprar um pacote com o preço antigo.
+    """
+    rejeitadas, lidas = [], 0
+    documentos = {}
+    for numero, linha in linhas:
+        lidas += 1
+        if lidas == 1 and _faltam_colunas(linha, COLUNAS_PRECOS):
+            raise ValueError(f"Colunas em falta: {', '.join(_faltam_colunas(linha, COLUNAS_PRECOS))}")
+        nome = str(linha.get("nome") or "").strip()
+        medida = str(linha.get("medida") or "").strip()
+        if not nome:
+            rejeitadas.append({"linha": numero, "receita": "", "motivo": "Nome em falta"})
+            continue
+        if medida not in MEDIDAS or medida in MEDIDAS_SUB_RECEITA:
+            rejeitadas.append({"linha": numero, "receita": "", "motivo": f"Medida inválida: {medida or '(vazia)'}"})
+            continue
+        try:
+            preco, tam = _numero(linha.get("preco_pacote")), _numero(linha.get("tam_pacote"))
+        except (TypeError, ValueError):
+            rejeitadas.append({"linha": numero, "receita": "", "motivo": MOTIVO_NUMERO})
+            continue
+        if tam <= 0 or preco < 0:
+            rejeitadas.append({"linha": numero, "receita": "", "motivo": "Pacote tem de ser positivo e o preço não pode ser negativo"})
+            continue
+
+        existente = servico.mestre.procurar(nome)
+        doc_id = existente["id"] if existente else id_ingrediente(nome)
+        if doc_id in documentos:
+            if CatalogoIngredientes.preco_na_unidade(documentos[doc_id], medida) is None:
+                motivo = f"Medida {medida} não combina com {documentos[doc_id]['unidade']} da primeira linha de {nome}"
+                rejeitadas.append({"linha": numero, "receita": "", "motivo": motivo})
+                continue
+            documentos[doc_id]["skus"].append({"tam_pacote": tam, "unidade": medida, "preco_compra": preco})
+            continue
+        documentos[doc_id] = {
+            "nome": existente["nome"] if existente else nome.title(), "unidade": medida,
+            "preco_compra": preco, "tam_pacote": tam, "skus": [],
+        }
+        if str(linha.get("categoria") or "").strip():
+            documentos[doc_id]["categoria"] = str(linha["categoria"]).strip()
+
+    propagadas = 0
+    if not simular and documentos:
+        servico.gravar_ingredientes(documentos)
+        propagadas = servico.propagar_custos([], documentos)
+    return relatorio(lidas, {"ingredients": len(documentos)}, rejeitadas, simular, propagadas)
+
+
+def relatorio(lidas, importados, rejeitadas, simular, propagadas=0):
+    return {
+        "simulacao": simular,
+        "linhas_lidas": lidas,
+        "importados": importados,
+        "receitas_recalculadas": propagadas,
+        "rejeitadas": sorted(rejeitadas, key=lambda r: r["linha"]),
+    }
@@ -0,0 +1,140 @@
+import math
+
+from panela.catalogo import CacheColecao
+from panela.grafo import eh_sub_receita, id_ingrediente
+from panela.unidades import CONVERSOES, normalizar_unidade
+
+
+def normalizar_nome(nome):
+    return id_ingrediente(nome).replace("_", " ")
+
+
+class IndiceIngredientes:
+    """O mestre numa versão fixa, por ID e por nome normalizado.
+
+    Os ciclos que resolvem muitas linhas (construir o grafo, propagar custos) leem
+    este retrato uma vez, sem voltar à cache nem ao seu lock a cada linha.
+    """
+
+    def __init__(self, documentos, versao):
+        self.versao = versao
+        self.por_id = {d["id"]: d for d in documentos}
+        self.por_nome = {normalizar_nome(d["nome"]): d for d in self.por_id.values()}
+
+    def obter(self, doc_id):
+        return self.por_id.get(doc_id)
+
+    def procurar(self, nome):
+        return self.por_nome.get(normalizar_nome(nome))
+
+    def resolver(self, ing):
+        """Documento do mestre referido por uma linha de receita (por ID ou, em linhas antigas, pelo nome)."""
+        mestre = self.por_id.get(ing.get("ingrediente_id"))
+        return mestre if mestre is not None else self.procurar(ing["nome"])
+
+
+class CatalogoIngredientes(CacheColecao):
+    """Mestre de preços da coleção `ingredients`, indexado por ID e por nome normalizado."""
+
+    def __init__(self, armazenamento, colecao="ingredients", **opcoes):
+        super().__init__(armazenamento, colecao, **opcoes)
+        self._indice = None
+
+    def indice(self):
+        """`IndiceIngredientes` da versão atual, refeito só quando o mestre muda. Não alterar."""
+        self._garantir_carregado()
+        with self._lock:
+            if self._indice is None or self._indice.versao != self.versao:
+                self._indice = IndiceIngredientes(self._documentos.values(), self.versao)
+            return self._indice
+
+    def procurar(self, nome):
+        return self.indice().procurar(nome)
+
+    def resolver(self, ing):
+        return self.indice().resolver(ing)
+
+    @staticmethod
+    def preco_na_unidade(mestre, unidade):
+        """(preco_compra, tam_pacote) do mestre expressos em `unidade`, ou None se as unidades não batem."""
+        base_mestre, fator_mestre = CONVERSOES.get(mestre["unidade"], (mestre["unidade"], 1))
+        base, fator = CONVERSOES.get(unidade, (unidade, 1))
+        if base != base_mestre:
+            return None
+        return mestre["preco_compra"], mestre["tam_pacote"] * fator_mestre / fator
+
+    @staticmethod
+    def skus(mestre):
+        """Pacotes à venda [(tamanho, preço)] em g/ml/unid: o pacote principal mais os de `skus`.
+
+        Cada entrada de `skus` é {"tam_pacote", "preco_compra"} e pode trazer a sua
+        própria "unidade" (ex.: saco de 5 kg num ingrediente registado em g); as que
+        não convertem para a unidade do mestre são ignoradas.
+        """
+        base_mestre, _, _ = normalizar_unidade(mestre["unidade"], 0, 0)
+        precos = {}
+        for sku in [mestre, *mestre.get("skus", [])]:
+            base, _, tam = normalizar_unidade(sku.get("unidade", mestre["unidade"]), 0, sku["tam_pacote"])
+            if tam > 0 and base == base_mestre:
+                precos[tam] = min(sku["preco_compra"], precos.get(tam, math.inf))
+        return sorted(precos.items())
+
+    def com_precos_atuais(self, linhas):
+        """Cópia das linhas com preço e pacote lidos do mestre (para carregar no editor)."""
+        indice, atualizadas = self.indice(), []
+        for ing in linhas:
+            mestre = None if eh_sub_receita(ing) else indice.resolver(ing)
+            atual = self.preco_na_unidade(mestre, ing.get("unidade")) if mestre else None
+            if atual is not None:
+                ing = {**ing, "preco_compra": atual[0], "tam_pacote": atual[1]}
+            atualizadas.append(ing)
+        return atualizadas
+
+    def precos_divergentes(self, linhas):
+        """{id: (nome, preço no mestre, preço na linha)} das linhas no pacote principal com outro preço."""
+        indice, divergentes = self.indice(), {}
+        for ing in linhas:
+            mestre = None if eh_sub_receita(ing) else indice.resolver(ing)
+            atual = self.preco_na_unidade(mestre, ing.get("unidade", "unid")) if mestre else None
+            if (atual is not None and math.isclose(atual[1], ing.get("tam_pacote", 1))
+                    and not math.isclose(atual[0], ing.get("preco_compra", 0))):
+                divergentes[mestre["id"]] = (mestre["nome"], atual[0], ing.get("preco_compra", 0))
+        return divergentes
+
+    def vincular(self, linhas, pendentes=None, atualizar_precos=False):
+        """Linhas com `ingrediente_id` preenchido e os documentos do mestre a gravar.
+
+        Ingredientes novos entram no mestre com o pacote da linha. Nos existentes o preço
+        só muda com `atualizar_precos`, e só pelas linhas no pacote principal do mestre;
+        um tamanho de pacote que o mestre ainda não tem fica registado como SKU.
+        `pendentes` são documentos do mestre ainda por gravar (numa importação) e contam
+        como gravados.
+        """
+        pendentes = pendentes or {}
+        indice, vinculadas, alterados = self.indice(), [], {}
+        for ing in linhas:
+            if eh_sub_receita(ing):
+                vinculadas.append(ing)
+                continue
+            mestre = indice.resolver(ing)
+            doc_id = mestre["id"] if mestre else id_ingrediente(ing["nome"])
+            vinculadas.append({**ing, "ingrediente_id": doc_id})
+            preco, tam = ing.get("preco_compra", 0), ing.get("tam_pacote", 1)
+            unidade = ing.get("unidade", "unid")
+            doc = {**(mestre or {}), **pendentes.get(doc_id, {}), **alterados.get(doc_id, {})}
+            if not doc:
+                alterados[doc_id] = {"nome": ing["nome"], "unidade": unidade, "preco_compra": preco, "tam_pacote": tam}
+                continue
+            atual = self.preco_na_unidade(doc, unidade) if tam > 0 else None
+            if atual is None:
+                # Unidade incompatível com o mestre (ex.: "unid" contra "g"): a linha fica com o preço próprio.
+                continue
+            if math.isclose(atual[1], tam):
+                if atualizar_precos and not math.isclose(atual[0], preco):
+                    alterados[doc_id] = {**pendentes.get(doc_id, {}), **alterados.get(doc_id, {}), "preco_compra": preco}
+                continue
+            _, _, tam_base = normalizar_unidade(unidade, 0, tam)
+            if not any(math.isclose(tam_base, conhecido) for conhecido, _ in self.skus(doc)):
+                sku = {"tam_pacote": tam, "unidade": unidade, "preco_compra": preco}
+                alterados[doc_id] = {**pendentes.get(doc_id, {}), **alterados.get(doc_id, {}), "skus": [*doc.get("skus", []), sku]}
+        return vinculadas, alterados
@@ -0,0 +1,110 @@
+"""Tempos e contadores dos caminhos quentes, por execução.
+
+Um `Medidor` ativo recolhe as etapas (`with etapa("nome")`) e os contadores
+(`contar("nome", n)`) do código que corre na mesma thread; sem medidor ativo as
+duas chamadas não fazem nada. No Streamlit há um medidor por rerun; listeners e
+downloads correm noutras threads e não entram na conta.
+"""
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from panela.armazenamento import Armazenamento
+
+_medidor_atual = contextvars.ContextVar("medidor_atual", default=None)
+_lock_jsonl = threading.Lock()
+
+
+class Medidor:
+    def __init__(self):
+        self._inicio = time.perf_counter()
+        self._etapas = defaultdict(lambda: [0.0, 0])
+        self.contadores = defaultdict(int)
+
+    def ativar(self):
+        _medidor_atual.set(self)
+        return self
+
+    def registar(self, nome, ms):
+        self._etapas[nome][0] += ms
+        self._etapas[nome][1] += 1
+
+    def contar(self, nome, n=1):
+        self.contadores[nome] += n
+
+    def resumo(self):
+        return {
+            "total_ms": round((time.perf_counter() - self._inicio) * 1000, 3),
+            "etapas": {nome: {"ms": round(ms, 3), "chamadas": n} for nome, (ms, n) in self._etapas.items()},
+            "contadores": dict(self.contadores),
+        }
+
+    def gravar_jsonl(self, caminho, **extra):
+        """Acrescenta o resumo como uma linha JSON (com `instante` e os campos de `extra`)."""
+        linha = {"instante": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), **extra, **self.resumo()}
+        with _lock_jsonl, open(caminho, "a", encoding="utf-8") as ficheiro:
+            ficheiro.write(json.dumps(linha, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def etapa(nome):
+    """Soma o tempo do bloco à etapa `nome` do medidor ativo (também serve de decorador)."""
+    medidor = _medidor_atual.get()
+    if medidor is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medidor.registar(nome, (time.perf_counter() - inicio) * 1000)
+
+
+def contar(nome, n=1):
+    medidor = _medidor_atual.get()
+    if medidor is not None:
+        medidor.contar(nome, n)
+
+
+class ArmazenamentoMedido(Armazenamento):
+    """Armazenamento que conta documentos lidos e escritos e cronometra cada acesso."""
+
+    def __init__(self, interno):
+        self.interno = interno
+
+    def _ler(self, colecao, documentos):
+        contar("leituras", 1)
+        contar("documentos_lidos", len(documentos))
+        contar(f"documentos_lidos.{colecao}", len(documentos))
+        return documentos
+
+    def listar(self, colecao, campos=None):
+        with etapa(f"armazenamento.listar.{colecao}"):
+            return self._ler(colecao, self.interno.listar(colecao, campos))
+
+    def obter(self, colecao, doc_ids):
+        with etapa(f"armazenamento.obter.{colecao}"):
+            return self._ler(colecao, self.interno.obter(colecao, doc_ids))
+
+    def alterados_desde(self, colecao, instante):
+        with etapa(f"armazenamento.alterados_desde.{colecao}"):
+            return self._ler(colecao, self.interno.alterados_desde(colecao, instante))
+
+    def gravar(self, colecao, documentos):
+        with etapa(f"armazenamento.gravar.{colecao}"):
+            self.interno.gravar(colecao, documentos)
+        contar("documentos_gravados", len(documentos))
+        contar(f"documentos_gravados.{colecao}", len(documentos))
+
+    def apagar(self, colecao, doc_ids):
+        doc_ids = list(doc_ids)
+        with etapa(f"armazenamento.apagar.{colecao}"):
+            self.interno.apagar(colecao, doc_ids)
+        contar("documentos_apagados", len(doc_ids))
+
+    def ouvir(self, colecao, callback):
+        return self.interno.ouvir(colecao, callback)
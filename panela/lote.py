@@ -0,0 +1,160 @@
+"""Planeamento em lote: vários planos de `productions` contra um único retrato do catálogo.
+
+Com `fork`, os processos do pool herdam o grafo já montado pelo processo pai;
+nos outros métodos recebem o retrato uma vez (no inicializador) e montam o seu.
+"""
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from panela.armazenamento import SQLiteArmazenamento
+from panela.catalogo import CatalogoReceitas
+from panela.compras import consolidar, lista_compras
+from panela.custos import COL_PRECO_VENDA, faturamento_projetado, precificar_fila
+from panela.ingredientes import CatalogoIngredientes
+from panela.instrumentacao import etapa
+from panela.planeamentos import hidratar_fila
+from panela.servico import ServicoPanela
+
+
+def retrato_catalogo(servico):
+    """Receitas e ingredientes tal como estão agora, prontos a enviar para outros processos."""
+    return {"recipes": servico.catalogo.listar(), "ingredients": servico.mestre.listar()}
+
+
+def servico_do_retrato(retrato):
+    # Base SQLite em memória: o retrato fica fixo durante todo o lote, sem consultas delta.
+    armazenamento = SQLiteArmazenamento(":memory:")
+    for colecao, documentos in retrato.items():
+        armazenamento.gravar(colecao, {doc["id"]: doc for doc in documentos})
+    return ServicoPanela(
+        armazenamento,
+        CatalogoReceitas(armazenamento, idade_maxima=math.inf),
+        CatalogoIngredientes(armazenamento, idade_maxima=math.inf),
+    )
+
+
+def planear(plano, servico, markup=3.0):
+    """Precificação, lista de compras e totais de um plano guardado."""
+    fila, em_falta = hidratar_fila(plano.get('fila', []), servico.catalogo)
+    grafo = servico.grafo()
+    with etapa("planeador.expandir"):
+        ingredientes_por_item = [grafo.expandir(item['receita'], item['qtd']) for item in fila]
+    with etapa("planeador.precificar"):
+        df_precificacao = precificar_fila(fila, grafo, markup)
+    # Itens sem preço guardado ficam com o preço sugerido pelo markup, como no Planeador.
+    for item, preco in zip(fila, df_precificacao[COL_PRECO_VENDA]):
+        if item.get('preco_venda_porcao') is None:
+            item['preco_venda_porcao'] = float(preco)
+    with etapa("planeador.consolidar"):
+        consolidados, custo_proporcional = consolidar(ingredientes_por_item)
+    with etapa("planeador.lista_compras"):
+        itens, desembolso = lista_compras(consolidados, servico.mestre)
+    return {
+        "plano": plano.get('nome', plano['id']),
+        "em_falta": em_falta,
+        "precificacao": df_precificacao.to_dict('records'),
+        "consolidados": consolidados,
+        "compras": itens,
+        "custo_proporcional": custo_proporcional,
+        "desembolso": desembolso,
+        "faturamento": faturamento_projetado(fila),
+    }
+
+
+def somar_consolidados(lista_consolidados):
+    """Junta as necessidades de vários planos por ingrediente, para comprar pacotes sobre o total."""
+    total = {}
+    for consolidados in lista_consolidados:
+        for chave, dados in consolidados.items():
+            if chave not in total:
+                total[chave] = {**dados}
+            else:
+                total[chave]["qtd_total"] += dados["qtd_total"]
+                total[chave]["custo_prop_acumulado"] += dados["custo_prop_acumulado"]
+    return total
+
+
+# --- POOL DE PROCESSOS ---
+_servico_trabalhador = None
+
+
+def _iniciar_trabalhador(retrato):
+    global _servico_trabalhador
+    if _servico_trabalhador is None:
+        _servico_trabalhador = servico_do_retrato(retrato)
+
+
+def _planear_no_trabalhador(plano, markup):
+    return planear(plano, _servico_trabalhador, markup)
+
+
+def planear_em_lote(planos, retrato, markup=3.0, processos=None):
+    """Resultados de `planear` por plano (na ordem de `planos`) e o total combinado.
+
+    Com `processos=1` corre tudo neste processo, sem pool.
+    """
+    global _servico_trabalhador
+    processos = processos or os.cpu_count() or 1
+    servico = servico_do_retrato(retrato)
+    servico.grafo()
+    if processos == 1 or len(planos) <= 1:
+        resultados = [planear(plano, servico, markup) for plano in planos]
+    else:
+        processos = min(processos, len(planos))
+        contexto = multiprocessing.get_context()
+        if contexto.get_start_method() == "fork":
+            _servico_trabalhador = servico
+        try:
+            with ProcessPoolExecutor(processos, mp_context=contexto, initializer=_iniciar_trabalhador, initargs=(retrato,)) as pool:
+                resultados = list(pool.map(
+                    _planear_no_trabalhador, planos, [markup] * len(planos),
+                    chunksize=max(1, len(planos) // (processos * 4)),
+                ))
+        finally:
+            _servico_trabalhador = None
+
+    consolidados = somar_consolidados(r["consolidados"] for r in resultados)
+    itens, desembolso = lista_compras(consolidados, servico.mestre)
+    combinado = {
+        "plano": "TOTAL",
+        "compras": itens,
+        "custo_proporcional": sum(r["custo_proporcional"] for r in resultados),
+        "desembolso": desembolso,
+        "faturamento": sum(r["faturamento"] for r in resultados),
+    }
+    return resultados, combinado
+
+
+# --- TABELAS ---
+def tabela_compras(resultado):
+    unidade = [item['unidade'] for item in resultado["compras"]]
+    return pd.DataFrame({
+        "Plano": resultado["plano"],
+        "Ingrediente": [item['nome'] for item in resultado["compras"]],
+        "Unidade": unidade,
+        "Necessidade Real": [item['qtd_total'] for item in resultado["compras"]],
+        "Comprar (Pacotes)": [
+            " + ".join(f"{n}x ({tam:g}{u})" for tam, _, n in item['pacotes'])
+            for item, u in zip(resultado["compras"], unidade)
+        ],
+        "Custo Proporcional": [item['custo_prop_acumulado'] for item in resultado["compras"]],
+        "Desembolso Caixa": [item['desembolso'] for item in resultado["compras"]],
+    })
+
+
+def tabelas_lote(resultados, combinado):
+    """DataFrames `resumo`, `precificacao`, `compras` (por plano) e `compras_total`."""
+    resumo = pd.DataFrame([
+        {
+            "Plano": r["plano"], "Custo Proporcional": r["custo_proporcional"], "Desembolso Caixa": r["desembolso"],
+            "Faturamento Projetado": r["faturamento"], "Receitas em Falta": len(r.get("em_falta", [])),
+        }
+        for r in [*resultados, combinado]
+    ])
+    precificacao = pd.DataFrame([{"Plano": r["plano"], **linha} for r in resultados for linha in r["precificacao"]])
+    compras = pd.concat([tabela_compras(r) for r in resultados], ignore_index=True) if resultados else tabela_compras(combinado)
+    return {"resumo": resumo, "precificacao": precificacao, "compras": compras, "compras_total": tabela_compras(combinado)}
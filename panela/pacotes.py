@@ -0,0 +1,80 @@
+import math
+from functools import lru_cache, reduce
+
+# Teto de "degraus" da programação dinâmica. Só acima dele a grelha exata (o mdc dos
+# tamanhos) alarga, nunca além do menor pacote; a cobertura continua garantida, o ótimo não.
+LIMITE_DEGRAUS = 200_000
+
+
+def otimizar_pacotes(qtd, skus):
+    """Combinação mais barata de pacotes que cobre `qtd`.
+
+    `skus` é uma lista de (tamanho, preço) na mesma unidade de `qtd`. Devolve
+    (custo, contagens), com `contagens[i]` pacotes do SKU `i`.
+    """
+    custo, contagens = _otimizar(float(qtd), tuple((float(tam), float(preco)) for tam, preco in skus))
+    return custo, list(contagens)
+
+
+# A lista de compras é recalculada a cada rerun com as mesmas quantidades.
+@lru_cache(maxsize=4096)
+def _otimizar(qtd, skus):
+    contagens = [0] * len(skus)
+    validos = [(i, tam, preco) for i, (tam, preco) in enumerate(skus) if tam > 0]
+    if qtd <= 0 or not validos:
+        return 0.0, tuple(contagens)
+    if len(validos) == 1:
+        i, tam, preco = validos[0]
+        contagens[i] = math.ceil(qtd / tam)
+        return contagens[i] * preco, tuple(contagens)
+
+    # Grelha inteira exata: o mdc dos tamanhos em milésimos.
+    milesimos = [max(round(tam * 1000), 1) for _, tam, _ in validos]
+    mdc = reduce(math.gcd, milesimos)
+    degraus = [m // mdc for m in milesimos]
+    alvo = math.ceil(qtd * 1000 / mdc - 1e-9)
+
+    # Há sempre uma solução ótima com menos de `degraus[melhor]` pacotes dos outros SKUs
+    # (senão um subconjunto deles somaria um múltiplo do melhor e podia ser trocado).
+    # Acima desse teto o resto é coberto só com o SKU de melhor preço por unidade.
+    melhor = min(range(len(validos)), key=lambda k: validos[k][2] / degraus[k])
+    teto = degraus[melhor] * (max(degraus) + 1)
+    fixos = max(0, (alvo - teto) // degraus[melhor])
+    alvo -= fixos * degraus[melhor]
+
+    grelha_larga = alvo > LIMITE_DEGRAUS
+    if grelha_larga:
+        # Tamanhos arredondados para baixo na grelha larga: cada pacote cobre pelo menos o que a DP conta.
+        fator = min(math.ceil(alvo / LIMITE_DEGRAUS), min(degraus))
+        degraus = [d // fator for d in degraus]
+        alvo = math.ceil(alvo / fator)
+
+    custo = [0.0] + [math.inf] * alvo
+    escolha = [-1] * (alvo + 1)
+    for t in range(1, alvo + 1):
+        for k, (_, _, preco) in enumerate(validos):
+            candidato = custo[max(t - degraus[k], 0)] + preco
+            if candidato < custo[t]:
+                custo[t], escolha[t] = candidato, k
+
+    t = alvo
+    while t > 0:
+        k = escolha[t]
+        contagens[validos[k][0]] += 1
+        t = max(t - degraus[k], 0)
+    contagens[validos[melhor][0]] += fixos
+
+    # Confirmação com os tamanhos reais (tolerando o arredondamento aos milésimos).
+    coberto = sum(n * tam for n, (tam, _) in zip(contagens, skus))
+    if coberto < qtd - 0.0005 * sum(contagens):
+        contagens[validos[melhor][0]] += math.ceil((qtd - coberto) / validos[melhor][1])
+    custo_total = sum(n * preco for n, (_, preco) in zip(contagens, skus))
+
+    if grelha_larga:
+        # A grelha larga pode perder o ótimo; nunca fica pior do que comprar um só tamanho.
+        for i, tam, preco in validos:
+            n = math.ceil(qtd / tam)
+            if n * preco < custo_total:
+                custo_total, contagens = n * preco, [0] * len(skus)
+                contagens[i] = n
+    return custo_total, tuple(contagens)
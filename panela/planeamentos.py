@@ -0,0 +1,26 @@
+def compactar_fila(fila):
+    """Fila no formato gravado em `productions`: só referências, fornadas e preço de venda.
+
+    Itens já compactos (com `receita_id`) passam como estão.
+    """
+    return [
+        {"receita_id": item.get('receita_id') or item['receita']['id'], "qtd": item['qtd'], "preco_venda_porcao": item.get('preco_venda_porcao')}
+        for item in fila
+    ]
+
+
+def hidratar_fila(fila_salva, catalogo):
+    """Fila de trabalho com a receita atual do catálogo em cada item.
+
+    Aceita também planos antigos, que traziam a receita inteira em `receita`.
+    Devolve (fila, ids_em_falta) para avisar de receitas entretanto apagadas.
+    """
+    fila, em_falta = [], []
+    for item in fila_salva:
+        receita_id = item.get('receita_id') or item.get('receita', {}).get('id')
+        receita = catalogo.obter(receita_id) if receita_id else None
+        if receita is None:
+            em_falta.append(receita_id or item.get('receita', {}).get('name', '?'))
+            continue
+        fila.append({"receita": receita, "qtd": item['qtd'], "preco_venda_porcao": item.get('preco_venda_porcao')})
+    return fila, em_falta
@@ -0,0 +1,49 @@
+import math
+
+from panela.grafo import eh_sub_receita
+
+
+def _mesmo_preco(a, b):
+    return all(math.isclose(x, y) for x, y in zip(a, b))
+
+
+def _pacote_sub_receita(sub, ing):
+    # Em "receita" o pacote é a fornada inteira; em "porções", o rendimento.
+    if ing.get('unidade') == 'receita':
+        return 1.0
+    return max(sub.get('rendimento', 1.0), 0.01)
+
+
+def recalcular_dependentes(receitas_por_nome, grafo, alteradas, ingredientes_alterados=(), mestre=None):
+    """Receitas cujo custo guardado ficou desatualizado, já recalculadas.
+
+    `alteradas` são as receitas acabadas de gravar e `ingredientes_alterados` os
+    IDs do mestre cujo preço mudou; as linhas base passam a refletir o preço de
+    `mestre`. Só os ancestrais afetados são visitados, das bases para as
+    receitas-mãe, para que cada uma já veja o `total_cost` novo das sub-receitas.
+    """
+    indice = mestre.indice() if mestre is not None else None
+    afetadas = set(alteradas)
+    for doc_id in ingredientes_alterados:
+        afetadas |= grafo.usos_ingrediente(doc_id)
+
+    novas = {}
+    for nome in grafo.ancestrais(afetadas):
+        receita = receitas_por_nome[nome]
+        linhas, mudou = [], False
+        for ing in receita.get('ingredients', []):
+            if eh_sub_receita(ing):
+                sub = novas.get(ing['nome']) or receitas_por_nome.get(ing['nome'])
+                atual = (sub['total_cost'], _pacote_sub_receita(sub, ing)) if sub else None
+            else:
+                doc = indice.resolver(ing) if indice is not None else None
+                atual = mestre.preco_na_unidade(doc, ing.get('unidade')) if doc else None
+            if atual is not None and not _mesmo_preco(atual, (ing.get('preco_compra', 0), ing.get('tam_pacote', 1))):
+                preco, tam = atual
+                ing = {**ing, "preco_compra": preco, "tam_pacote": tam, "custo_final": preco / max(tam, 0.0001) * ing.get('qtd_usada', 0)}
+                mudou = True
+            linhas.append(ing)
+        if mudou:
+            novas[nome] = {**receita, "ingredients": linhas, "total_cost": sum(i.get('custo_final', 0) for i in linhas)}
+    return novas
+
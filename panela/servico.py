@@ -0,0 +1,114 @@
+from panela.catalogo import CatalogoReceitas
+from panela.ingredientes import CatalogoIngredientes
+from panela.planeamentos import compactar_fila, hidratar_fila
+from panela.propagacao import recalcular_dependentes
+
+
+def id_receita(nome, autor):
+    return f"{nome}_{autor}".replace(" ", "_").lower()
+
+
+def id_planeamento(nome):
+    return nome.replace(" ", "_").lower()
+
+
+class ServicoPanela:
+    """Operações de escrita e leitura sobre um armazenamento, sem interface.
+
+    Junta o catálogo de receitas e o mestre de ingredientes em cache e mantém-nos
+    coerentes com o que é gravado; é o que a página Streamlit, o CLI e os jobs usam.
+    """
+
+    def __init__(self, armazenamento, catalogo=None, mestre=None):
+        self.armazenamento = armazenamento
+        self.catalogo = catalogo if catalogo is not None else CatalogoReceitas(armazenamento)
+        self.mestre = mestre if mestre is not None else CatalogoIngredientes(armazenamento)
+
+    def grafo(self):
+        return self.catalogo.grafo(self.mestre)
+
+    def versao(self):
+        """(versão do catálogo, versão do mestre): muda sempre que este processo vê uma alteração."""
+        self.catalogo._garantir_carregado()
+        self.mestre._garantir_carregado()
+        return self.catalogo.versao, self.mestre.versao
+
+    # --- RECEITAS ---
+    def salvar_receita(self, nome, autor, ingredientes, rendimento, atualizar_precos=False):
+        """Grava a receita e devolve quantas outras receitas tiveram o custo atualizado.
+
+        Com `atualizar_precos`, as linhas no pacote principal de um ingrediente passam o
+        preço ao mestre (ver `CatalogoIngredientes.precos_divergentes`); sem ele, ficam
+        com o preço do mestre. Levanta ErroCicloReceitas se a receita fechar um ciclo.
+        """
+        self.grafo().verificar_sem_ciclo(nome, ingredientes)
+        ingredientes, mestre_alterado = self.mestre.vincular(ingredientes, atualizar_precos=atualizar_precos)
+        self.gravar_ingredientes(mestre_alterado)
+        doc_id = id_receita(nome, autor)
+        dados = {
+            "name": nome,
+            "author": autor,
+            "rendimento": max(rendimento, 0.01),
+            "ingredients": ingredientes,
+            "total_cost": sum(i.get('custo_final', 0) for i in ingredientes)
+        }
+        self.armazenamento.gravar("recipes", {doc_id: dados})
+        self.catalogo.aplicar(doc_id, dados)
+        return self.propagar_custos([nome], mestre_alterado, sem_contar=[doc_id])
+
+    def propagar_custos(self, alteradas, ingredientes_alterados=(), sem_contar=()):
+        # Recalcula só as receitas que usam o que mudou e grava-as num único lote.
+        novas = recalcular_dependentes(
+            self.catalogo.por_nome(), self.grafo(), alteradas, ingredientes_alterados, self.mestre
+        )
+        atualizacoes = {r['id']: {"ingredients": r['ingredients'], "total_cost": r['total_cost']} for r in novas.values()}
+        if atualizacoes:
+            self.armazenamento.gravar("recipes", atualizacoes)
+            for doc_id, dados in atualizacoes.items():
+                self.catalogo.aplicar(doc_id, dados)
+        return len(atualizacoes.keys() - set(sem_contar))
+
+    def apagar_receita(self, doc_id):
+        self.armazenamento.apagar("recipes", [doc_id])
+        self.catalogo.remover(doc_id)
+
+    # --- INGREDIENTES ---
+    def gravar_ingredientes(self, documentos):
+        if documentos:
+            self.armazenamento.gravar("ingredients", documentos)
+            for ing_id, dados in documentos.items():
+                self.mestre.aplicar(ing_id, dados)
+
+    def guardar_skus(self, skus_por_ingrediente):
+        """Substitui a lista `skus` dos ingredientes indicados, gravando só os que mudaram.
+
+        Levanta ValueError se um SKU vier numa unidade que não converte para a do mestre.
+        """
+        for ing_id, skus in skus_por_ingrediente.items():
+            mestre = self.mestre.obter(ing_id)
+            for sku in skus:
+                if mestre is not None and self.mestre.preco_na_unidade(mestre, sku.get("unidade", mestre["unidade"])) is None:
+                    raise ValueError(f"Embalagem em {sku['unidade']} não serve para {mestre['nome']} (em {mestre['unidade']})")
+        alterados = {
+            ing_id: {"skus": skus} for ing_id, skus in skus_por_ingrediente.items()
+            if skus != (self.mestre.obter(ing_id) or {}).get('skus', [])
+        }
+        self.gravar_ingredientes(alterados)
+        return len(alterados)
+
+    # --- PLANEAMENTOS ---
+    def listar_planeamentos(self):
+        # Só nome e data para a lista; a fila completa é lida ao carregar o plano.
+        return self.armazenamento.listar("productions", campos=["nome", "updated_at"])
+
+    def carregar_planeamento(self, doc_id):
+        """(nome, fila hidratada, ids de receitas em falta) de um plano guardado."""
+        plano = self.armazenamento.obter_um("productions", doc_id)
+        fila, em_falta = hidratar_fila(plano.get('fila', []), self.catalogo)
+        return plano['nome'], fila, em_falta
+
+    def salvar_planeamento(self, nome, fila):
+        self.armazenamento.gravar("productions", {id_planeamento(nome): {"nome": nome, "fila": compactar_fila(fila)}})
+
+    def apagar_planeamento(self, doc_id):
+        self.armazenamento.apagar("productions", [doc_id])
@@ -0,0 +1,12 @@
+TAMANHO_MINIMO = 0.0001
+
+# Opções da coluna "Medida" no editor de fichas técnicas.
+MEDIDAS = ["g", "ml", "unid", "kg", "L", "receita", "porções"]
+
+# kg e L são convertidos para g e ml para que a mesma matéria-prima some sempre na mesma unidade.
+CONVERSOES = {"kg": ("g", 1000), "L": ("ml", 1000)}
+
+
+def normalizar_unidade(unidade, qtd, tam_pacote):
+    unidade_base, fator = CONVERSOES.get(unidade, (unidade, 1))
+    return unidade_base, qtd * fator, tam_pacote * fator
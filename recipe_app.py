@@ -1,10 +1,18 @@
 import streamlit as st
 import pandas as pd
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
 import json
-import math
+import os
+from panela import MEDIDAS, ErroCicloReceitas, ServicoPanela
+from panela.custos import (
+    COL_FORNADAS, COL_PRECO_VENDA, COLUNAS_EDITOR, custear_alteracoes, linhas_alteradas, linhas_para_editor, precificar_fila,
+)
+from panela.compras import formatar_lista_compras
+from panela.exportacao import MIME, em_partes, linhas_catalogo, linhas_receitas, para_download
+from panela.importacao import importar_precos, importar_receitas, ler_linhas
+from panela.instrumentacao import ArmazenamentoMedido, Medidor, contar, etapa
+from panela.lote import planear
+from panela.planeamentos import compactar_fila
+from panela.armazenamento import FirestoreArmazenamento, SQLiteArmazenamento
 
 # --- 1. CONFIGURAÇÃO VISUAL ---
 st.set_page_config(
@@ -22,9 +30,19 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Tempos e contagens desta execução; o painel de administração mostra-os no fim da página.
+medidor = Medidor().ativar()
+
 # --- 2. CONEXÃO SEGURA ---
+# PANELA_BACKEND=sqlite corre tudo num ficheiro local (cozinha offline, testes, benchmarks).
+# O armazenamento vai embrulhado para contar os documentos lidos e gravados em cada execução.
 @st.cache_resource
 def conectar():
+    if os.environ.get("PANELA_BACKEND", "firestore") == "sqlite":
+        return ArmazenamentoMedido(SQLiteArmazenamento(os.environ.get("PANELA_SQLITE", "panela.db")))
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     if not firebase_admin._apps:
         try:
             cred = credentials.Certificate("firebase_key.json") 
@@ -37,47 +55,36 @@ def conectar():
             else:
                 st.error("🔌 Erro crítico: Falha na conexão com o banco de dados Firebase.")
                 st.stop()
-    return firestore.client()
-
-db = conectar()
-
-# --- 3. LÓGICA DO SISTEMA ---
-def pegar_receitas():
-    docs = db.collection("recipes").stream()
-    return [{"id": doc.id, **doc.to_dict()} for doc in docs]
-
-def salvar_receita(nome, autor, ingredientes, rendimento):
-    doc_id = f"{nome}_{autor}".replace(" ", "_").lower()
-    custo = sum(i.get('custo_final', 0) for i in ingredientes)
-    db.collection("recipes").document(doc_id).set({
-        "name": nome, 
-        "author": autor, 
-        "rendimento": max(rendimento, 0.01),
-        "ingredients": ingredientes, 
-        "total_cost": custo,
-        "updated_at": firestore.SERVER_TIMESTAMP
-    }, merge=True)
-
-def apagar_receita(doc_id):
-    db.collection("recipes").document(doc_id).delete()
-
-# --- FUNÇÕES DE PLANEAMENTO DE PRODUÇÃO ---
-def pegar_planeamentos():
-    docs = db.collection("productions").stream()
-    return [{"id": doc.id, **doc.to_dict()} for doc in docs]
-
-def salvar_planeamento(nome, fila):
-    doc_id = nome.replace(" ", "_").lower()
-    db.collection("productions").document(doc_id).set({
-        "nome": nome, 
-        "fila": fila,
-        "updated_at": firestore.SERVER_TIMESTAMP
-    }, merge=True)
-
-def apagar_planeamento(doc_id):
-    db.collection("productions").document(doc_id).delete()
-
-# --- 4. CARTÕES FINANCEIROS DINÂMICOS ---
+    return ArmazenamentoMedido(FirestoreArmazenamento(firestore.client()))
+
+armazenamento = conectar()
+
+# Cache partilhado por todas as sessões: carrega uma vez e segue o Firestore por listener.
+# As regras de custo, propagação e planeamento vivem em `panela`; esta página só as mostra.
+@st.cache_resource
+def servico_panela():
+    return ServicoPanela(armazenamento)
+
+with etapa("servico.iniciar"):
+    servico = servico_panela()
+catalogo = servico.catalogo
+mestre_ingredientes = servico.mestre
+
+# A fila da sessão é compacta (receita_id, fornadas, preço); as tabelas derivadas ficam num cache
+# partilhado com a fila, o markup e a versão do catálogo na chave. Um rerun sem mudanças não recalcula.
+@st.cache_data(max_entries=256, show_spinner=False)
+def tabelas_planeador(fila, markup, versao):
+    contar("planeador.recalculos")
+    resultado = planear({"id": "sessao", "fila": fila}, servico, markup)
+    with etapa("planeador.tabela_compras"):
+        compras = pd.DataFrame(formatar_lista_compras(resultado["compras"]))
+    return {
+        "precificacao": pd.DataFrame(resultado["precificacao"]),
+        "compras": compras,
+        **{chave: resultado[chave] for chave in ("em_falta", "custo_proporcional", "desembolso", "faturamento")},
+    }
+
+# --- 3. CARTÕES FINANCEIROS DINÂMICOS ---
 def cartao_financeiro(titulo, valor, cor_borda, icone, subtitulo=""):
     st.markdown(f"""
     <div style="background-color: var(--secondary-background-color); padding: 15px; border-radius: 10px; border-left: 5px solid {cor_borda}; margin-bottom: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
@@ -87,7 +94,7 @@ def cartao_financeiro(titulo, valor, cor_borda, icone, subtitulo=""):
     </div>
     """, unsafe_allow_html=True)
 
-# --- 5. INTERFACE PRINCIPAL ---
+# --- 4. INTERFACE PRINCIPAL ---
 c_head1, c_head2 = st.columns([1, 8])
 c_head1.markdown("# 🥘")
 c_head2.title("Panela de Controle | Gestão & Ficha Técnica")
@@ -100,13 +107,18 @@ with st.sidebar:
 if 'fila_producao' not in st.session_state: st.session_state.fila_producao = []
 if 'nome_plano_atual' not in st.session_state: st.session_state.nome_plano_atual = ""
 if 'df_ingredientes' not in st.session_state:
-    st.session_state.df_ingredientes = pd.DataFrame(columns=["Tipo", "Nome", "Preco_Pacote", "Tam_Pacote", "Medida", "Qtd_Usada"])
+    st.session_state.df_ingredientes = pd.DataFrame(columns=COLUNAS_EDITOR)
 if 'rec_nome_edicao' not in st.session_state: st.session_state.rec_nome_edicao = ""
 if 'rec_autor_edicao' not in st.session_state: st.session_state.rec_autor_edicao = "Chef"
 if 'rec_rendimento_edicao' not in st.session_state: st.session_state.rec_rendimento_edicao = 1.0
 
-receitas_salvas = pegar_receitas()
-dict_receitas = {r['name']: r for r in receitas_salvas}
+with etapa("catalogo.listar"):
+    receitas_salvas = catalogo.listar()
+dict_receitas = catalogo.por_nome()
+
+with st.sidebar:
+    with st.expander("📈 Cache do Catálogo"):
+        st.json(catalogo.metricas())
 
 aba_criar, aba_listar, aba_calculadora = st.tabs([
     "📝 Criar / Editar Receita", 
@@ -128,15 +140,7 @@ with aba_criar:
                 st.session_state.rec_autor_edicao = rec_dados.get('author', 'Chef')
                 st.session_state.rec_rendimento_edicao = rec_dados.get('rendimento', 1.0) 
                 
-                df_temp = pd.DataFrame(rec_dados['ingredients'])
-                novo_df = pd.DataFrame()
-                novo_df['Tipo'] = df_temp['tipo'] if 'tipo' in df_temp.columns else 'Ingrediente'
-                novo_df['Nome'] = df_temp['nome']
-                novo_df['Preco_Pacote'] = df_temp['preco_compra']
-                novo_df['Tam_Pacote'] = df_temp['tam_pacote']
-                novo_df['Medida'] = df_temp['unidade']
-                novo_df['Qtd_Usada'] = df_temp['qtd_usada']
-                st.session_state.df_ingredientes = novo_df
+                st.session_state.df_ingredientes = linhas_para_editor(mestre_ingredientes.com_precos_atuais(rec_dados['ingredients']))
                 st.rerun()
 
     st.divider()
@@ -149,9 +153,22 @@ with aba_criar:
     st.markdown("### 🛒 Ingredientes e Sub-receitas")
     
     # --- NOVIDADE VISUAL: CONTROLO CLARO DE SUB-RECEITAS ---
+    # Corre no clique, antes do rerun (sem st.rerun extra), e parte da tabela tal como ficou no
+    # último rerun, por isso as edições ainda por guardar não se perdem.
+    def inserir_sub_receita():
+        rec_sub = catalogo.por_nome()[st.session_state.sub_receita_base]
+        anterior = st.session_state.get("custeio_editor")
+        df = (anterior["df"] if anterior else st.session_state.df_ingredientes)[COLUNAS_EDITOR].reset_index(drop=True)
+        df.loc[len(df)] = [
+            "Sub-receita", rec_sub['name'], rec_sub['total_cost'], max(rec_sub.get('rendimento', 1.0), 0.01),
+            "porções", st.session_state.sub_receita_qtd
+        ]
+        df.index = pd.RangeIndex(len(df))
+        st.session_state.df_ingredientes = df
+
     with st.popover("➕ Adicionar uma Sub-Receita (Mistura de Receitas)"):
         if receitas_salvas:
-            sel_sub = st.selectbox("Escolher Receita Base", list(dict_receitas.keys()))
+            sel_sub = st.selectbox("Escolher Receita Base", list(dict_receitas.keys()), key="sub_receita_base")
             rec_sub_dados = dict_receitas[sel_sub]
             rendimento_sub = max(rec_sub_dados.get('rendimento', 1.0), 0.01)
             custo_total_sub = rec_sub_dados.get('total_cost', 0)
@@ -159,62 +176,70 @@ with aba_criar:
             
             st.info(f"ℹ️ A receita original de **{sel_sub}** rende **{rendimento_sub:.1f} porções**.\n\nO custo base dela é de **R$ {custo_por_porcao_sub:.2f} por porção**.")
             
-            qtd_sub = st.number_input(f"Vai usar quantas PORÇÕES de {sel_sub} nesta nova receita?", min_value=0.01, value=1.0)
+            st.number_input(f"Vai usar quantas PORÇÕES de {sel_sub} nesta nova receita?", min_value=0.01, value=1.0, key="sub_receita_qtd")
             
-            if st.button("Inserir Sub-Receita na Tabela"):
-                nova_linha = pd.DataFrame([{
-                    "Tipo": "Sub-receita", "Nome": rec_sub_dados['name'],
-                    "Preco_Pacote": rec_sub_dados['total_cost'], "Tam_Pacote": rendimento_sub, 
-                    "Medida": "porções", "Qtd_Usada": qtd_sub 
-                }])
-                st.session_state.df_ingredientes = pd.concat([st.session_state.df_ingredientes, nova_linha], ignore_index=True)
-                st.rerun()
+            st.button("Inserir Sub-Receita na Tabela", on_click=inserir_sub_receita)
         else:
             st.warning("É necessário guardar pelo menos uma receita primeiro.")
     
     st.caption("Adicione linhas na tabela. Nota: O 'Preço do Pacote' aceita o valor **0** (para patrocínios ou doações).")
     
-    edited_df = st.data_editor(
-        st.session_state.df_ingredientes, num_rows="dynamic",
-        column_config={
-            "Tipo": st.column_config.SelectboxColumn("Tipo", options=["Ingrediente", "Sub-receita"], default="Ingrediente"),
-            "Nome": st.column_config.TextColumn("Nome do Item", required=True),
-            "Preco_Pacote": st.column_config.NumberColumn("Preço Pacote (R$)", min_value=0.0, format="%.2f"), 
-            "Tam_Pacote": st.column_config.NumberColumn("Tamanho Pacote", min_value=0.0001),
-            "Medida": st.column_config.SelectboxColumn("Medida", options=["g", "ml", "unid", "kg", "L", "receita", "porções"]),
-            "Qtd_Usada": st.column_config.NumberColumn("Qtd Usada", min_value=0.0001)
-        }, use_container_width=True, hide_index=True
-    )
-
-    custo_total_estimado = 0
-    ingredientes_processados = []
-    
-    for _, row in edited_df.dropna(how='any').iterrows():
-        if row['Tam_Pacote'] > 0:
-            nome_limpo = str(row['Nome']).strip().title()
-            custo_linha = (row['Preco_Pacote'] / row['Tam_Pacote']) * row['Qtd_Usada']
-            custo_total_estimado += custo_linha
-            ingredientes_processados.append({
-                "tipo": row['Tipo'], "nome": nome_limpo if row['Tipo'] == 'Ingrediente' else row['Nome'], 
-                "preco_compra": row['Preco_Pacote'], "tam_pacote": row['Tam_Pacote'],
-                "unidade": row['Medida'], "qtd_usada": row['Qtd_Usada'], "custo_final": custo_linha
-            })
+    with etapa("editor.data_editor"):
+        edited_df = st.data_editor(
+            st.session_state.df_ingredientes, num_rows="dynamic",
+            column_config={
+                "Tipo": st.column_config.SelectboxColumn("Tipo", options=["Ingrediente", "Sub-receita"], default="Ingrediente"),
+                "Nome": st.column_config.TextColumn("Nome do Item", required=True),
+                "Preco_Pacote": st.column_config.NumberColumn("Preço Pacote (R$)", min_value=0.0, format="%.2f"), 
+                "Tam_Pacote": st.column_config.NumberColumn("Tamanho Pacote", min_value=0.0001),
+                "Medida": st.column_config.SelectboxColumn("Medida", options=MEDIDAS),
+                "Qtd_Usada": st.column_config.NumberColumn("Qtd Usada", min_value=0.0001)
+            }, use_container_width=True, hide_index=True
+        )
+
+    with etapa("editor.custear"):
+        # Só as linhas que mudaram desde o último rerun voltam a ser custeadas.
+        custeio_anterior = st.session_state.get("custeio_editor", {})
+        linhas_custeadas = custear_alteracoes(edited_df, custeio_anterior.get("df"), custeio_anterior.get("linhas"))
+        st.session_state.custeio_editor = {"df": edited_df, "linhas": linhas_custeadas}
+        custo_total_estimado = float(linhas_custeadas['custo_final'].sum())
 
     if custo_total_estimado >= 0:
         custo_por_porcao = custo_total_estimado / rendimento_receita if rendimento_receita > 0 else 0
         st.success(f"💰 Custo Fornada Inteira: **R$ {custo_total_estimado:.2f}** | 🍽️ Custo Exato de 1 Porção: **R$ {custo_por_porcao:.2f}**")
 
+    # Um preço novo no pacote principal de um ingrediente só passa para o mestre com confirmação;
+    # sem ela a receita é guardada com o preço do mestre.
+    precos_novos = mestre_ingredientes.precos_divergentes(linhas_custeadas.to_dict('records'))
+    atualizar_precos = False
+    if precos_novos:
+        st.warning("💲 Preço diferente do registado: " + "; ".join(
+            f"**{nome}** R$ {antigo:.2f} → R$ {novo:.2f}" for nome, antigo, novo in precos_novos.values()
+        ))
+        atualizar_precos = st.checkbox(
+            "Atualizar estes preços no mestre (muda o custo de todas as receitas que os usam)",
+            key="atualizar_precos_mestre", help="Sem esta opção, a receita fica com o preço registado."
+        )
+
     c_save, c_clear = st.columns([1, 4])
     if c_save.button("💾 Guardar Receita", type="primary"):
-        if nome_receita and ingredientes_processados:
-            salvar_receita(nome_receita, autor_receita, ingredientes_processados, rendimento_receita)
-            st.success("Receita guardada com sucesso na base de dados!")
-            st.rerun()
+        if nome_receita and not linhas_custeadas.empty:
+            try:
+                n_dependentes = servico.salvar_receita(
+                    nome_receita, autor_receita, linhas_custeadas.to_dict('records'), rendimento_receita, atualizar_precos
+                )
+            except ErroCicloReceitas as erro:
+                st.error(f"🔁 Não é possível guardar: {erro}")
+            else:
+                st.success("Receita guardada com sucesso na base de dados!")
+                if n_dependentes:
+                    st.toast(f"🔄 Custo atualizado em {n_dependentes} receita(s) que dependem desta.")
+                st.rerun()
         else:
             st.error("Preencha o nome da receita e adicione pelo menos um ingrediente válido.")
             
     if c_clear.button("🗑️ Limpar Formulário"):
-        st.session_state.df_ingredientes = pd.DataFrame(columns=["Tipo", "Nome", "Preco_Pacote", "Tam_Pacote", "Medida", "Qtd_Usada"])
+        st.session_state.df_ingredientes = pd.DataFrame(columns=COLUNAS_EDITOR)
         st.session_state.rec_nome_edicao = ""
         st.session_state.rec_rendimento_edicao = 1.0
         st.rerun()
@@ -224,6 +249,33 @@ with aba_criar:
 # ==================================================
 with aba_listar:
     st.subheader("📚 Base de Dados de Receitas")
+
+    with st.expander("📥 Importar Fichas Técnicas ou Tabela de Preços (CSV / XLSX)"):
+        st.caption(
+            "Fichas técnicas: uma linha por ingrediente, com as colunas **Receita, Autor, Rendimento, Tipo, Nome, "
+            "Preco_Pacote, Tam_Pacote, Medida, Qtd_Usada**. Tabela de preços: **Nome, Preco_Pacote, Tam_Pacote, Medida** "
+            "e, opcional, **Categoria**; várias linhas do mesmo ingrediente são os tamanhos à venda e substituem as "
+            "embalagens que ele tinha."
+        )
+        tipo_import = st.radio("O que vai importar?", ["Fichas técnicas", "Tabela de preços"], horizontal=True)
+        ficheiro_import = st.file_uploader("Ficheiro", type=["csv", "xlsx"])
+        simular_import = st.checkbox("Só validar (não grava nada)", value=True)
+        if ficheiro_import is not None and st.button("📥 Importar"):
+            importar = importar_receitas if tipo_import == "Fichas técnicas" else importar_precos
+            try:
+                relatorio = importar(servico, ler_linhas(ficheiro_import), simular=simular_import)
+            except ValueError as erro:
+                st.error(f"Não foi possível ler o ficheiro: {erro}")
+            else:
+                importados = relatorio["importados"]
+                resumo = f"{importados.get('recipes', 0)} receita(s) e {importados.get('ingredients', 0)} ingrediente(s)"
+                if simular_import:
+                    st.info(f"Simulação: seriam importados {resumo} de {relatorio['linhas_lidas']} linha(s).")
+                else:
+                    st.success(f"Importados {resumo}. Custo recalculado em {relatorio['receitas_recalculadas']} receita(s).")
+                if relatorio["rejeitadas"]:
+                    st.warning(f"{len(relatorio['rejeitadas'])} linha(s) rejeitada(s):")
+                    st.dataframe(pd.DataFrame(relatorio["rejeitadas"]), use_container_width=True, hide_index=True)
     if receitas_salvas:
         for rec in receitas_salvas:
             rend_salvo = rec.get('rendimento', 1.0)
@@ -231,16 +283,32 @@ with aba_listar:
             
             with st.expander(f"🍽️ {rec['name']} - Rende {rend_salvo} porções | Porção: R$ {custo_por_porcao:.2f} | Total: R$ {rec['total_cost']:.2f}"):
                 st.caption(f"Autor: {rec.get('author', 'Desconhecido')}")
-                df_ing = pd.DataFrame(rec['ingredients'])
-                
-                if 'tipo' not in df_ing.columns: 
-                    df_ing['tipo'] = 'Ingrediente'
+                with etapa("receitas.tabela"):
+                    df_ing = pd.DataFrame(rec['ingredients'])
+                    if 'tipo' not in df_ing.columns: 
+                        df_ing['tipo'] = 'Ingrediente'
                     
                 st.dataframe(df_ing[["tipo", "nome", "qtd_usada", "unidade", "custo_final"]], use_container_width=True, hide_index=True)
                 
                 if st.button("🗑️ Apagar esta receita permanentemente", key=f"del_{rec['id']}"):
-                    apagar_receita(rec['id'])
+                    servico.apagar_receita(rec['id'])
                     st.rerun()
+
+        with st.expander("⬇️ Exportar Catálogo Completo"):
+            st.caption("O ficheiro é gerado em partes só quando clica, sem prender a página.")
+            formato_export = st.selectbox("Formato", list(MIME), key="formato_catalogo")
+            grafo_export = servico.grafo()
+            c_exp1, c_exp2 = st.columns(2)
+            c_exp1.download_button(
+                "📄 Resumo por Receita", file_name=f"receitas.{formato_export}", mime=MIME[formato_export],
+                data=para_download(lambda: em_partes(linhas_receitas(catalogo, grafo_export)), formato_export),
+                use_container_width=True
+            )
+            c_exp2.download_button(
+                "🧾 Todos os Ingredientes (achatados)", file_name=f"catalogo_ingredientes.{formato_export}", mime=MIME[formato_export],
+                data=para_download(lambda: em_partes(linhas_catalogo(catalogo, grafo_export)), formato_export),
+                use_container_width=True
+            )
     else: 
         st.info("O seu banco de dados está vazio. Crie uma receita na aba anterior.")
 
@@ -251,24 +319,61 @@ with aba_calculadora:
     st.subheader("🛒 Carrinho de Produção Mestre")
     
     with st.expander("📂 Carregar / Gerir Planeamentos de Produção Salvos"):
-        planos_salvos = pegar_planeamentos()
+        with etapa("planeamentos.listar"):
+            planos_salvos = servico.listar_planeamentos()
         if planos_salvos:
             p_sel = st.selectbox("Escolha um planeamento guardado", ["-- Selecione --"] + [p['nome'] for p in planos_salvos])
             colA, colB = st.columns(2)
             if colA.button("📥 Carregar na Tabela"):
                 if p_sel != "-- Selecione --":
                     plano_escolhido = next(p for p in planos_salvos if p['nome'] == p_sel)
-                    st.session_state.fila_producao = plano_escolhido['fila']
-                    st.session_state.nome_plano_atual = plano_escolhido['nome']
+                    nome_plano, fila_plano, em_falta = servico.carregar_planeamento(plano_escolhido['id'])
+                    st.session_state.fila_producao = compactar_fila(fila_plano)
+                    st.session_state.nome_plano_atual = nome_plano
+                    if em_falta:
+                        st.toast(f"⚠️ {len(em_falta)} receita(s) deste plano já não existem e foram ignoradas.")
                     st.rerun()
             if colB.button("🗑️ Apagar do Banco"):
                 if p_sel != "-- Selecione --":
                     plano_escolhido = next(p for p in planos_salvos if p['nome'] == p_sel)
-                    apagar_planeamento(plano_escolhido['id'])
+                    servico.apagar_planeamento(plano_escolhido['id'])
                     st.success("Planeamento apagado!"); st.rerun()
         else:
             st.info("Nenhum planeamento salvo ainda. Guarde um no final desta página.")
 
+    with st.expander("📦 Embalagens à Venda (vários tamanhos por ingrediente)"):
+        st.caption("O pacote principal vem da ficha técnica. Acrescente aqui outros tamanhos (ex.: saco de 5 kg) para a lista de compras escolher a combinação mais barata.")
+        ingredientes_mestre = {d['nome']: d for d in mestre_ingredientes.listar()}
+        if ingredientes_mestre:
+            df_skus = pd.DataFrame(
+                [{"Ingrediente": d['nome'], "Tam_Pacote": sku['tam_pacote'], "Medida": sku.get('unidade', d['unidade']), "Preco_Pacote": sku['preco_compra']}
+                 for d in ingredientes_mestre.values() for sku in d.get('skus', [])],
+                columns=["Ingrediente", "Tam_Pacote", "Medida", "Preco_Pacote"]
+            )
+            edited_skus = st.data_editor(
+                df_skus, num_rows="dynamic", key="editor_skus",
+                column_config={
+                    "Ingrediente": st.column_config.SelectboxColumn("Ingrediente", options=sorted(ingredientes_mestre), required=True),
+                    "Tam_Pacote": st.column_config.NumberColumn("Tamanho Pacote", min_value=0.0001),
+                    "Medida": st.column_config.SelectboxColumn("Medida", options=["g", "ml", "unid", "kg", "L"]),
+                    "Preco_Pacote": st.column_config.NumberColumn("Preço Pacote (R$)", min_value=0.0, format="%.2f")
+                }, use_container_width=True, hide_index=True
+            )
+            if st.button("💾 Guardar Embalagens"):
+                novos_skus = {d['id']: [] for d in ingredientes_mestre.values()}
+                for sku in edited_skus.dropna(how='any').to_dict('records'):
+                    novos_skus[ingredientes_mestre[sku['Ingrediente']]['id']].append(
+                        {"tam_pacote": float(sku['Tam_Pacote']), "unidade": sku['Medida'], "preco_compra": float(sku['Preco_Pacote'])}
+                    )
+                try:
+                    servico.guardar_skus(novos_skus)
+                except ValueError as erro:
+                    st.error(f"📦 {erro}")
+                else:
+                    st.success("Embalagens guardadas!"); st.rerun()
+        else:
+            st.info("Os ingredientes aparecem aqui depois de guardar a primeira receita.")
+
     col_markup, col_vazia2 = st.columns([1, 2])
     with col_markup:
         markup_padrao = st.number_input("📈 Markup Inicial Sugerido", min_value=1.0, value=3.0, step=0.1, help="Multiplicador base de lucro.")
@@ -283,154 +388,82 @@ with aba_calculadora:
             multiplicador = c_qtd.number_input("Fornadas (Lotes inteiros)", min_value=1.0, value=1.0, step=1.0)
             
             if c_btn.button("➕ Adicionar à Fila"):
+                # O preço sugerido entra já na fila, para a chave das tabelas não mudar logo no rerun seguinte.
+                try:
+                    preco_sugerido = float(precificar_fila([{"receita": dados_rec, "qtd": multiplicador}], servico.grafo(), markup_padrao)[COL_PRECO_VENDA].iat[0])
+                except ErroCicloReceitas:
+                    preco_sugerido = None
                 st.session_state.fila_producao.append({
-                    "receita": dados_rec, "qtd": multiplicador, "preco_venda_porcao": None 
+                    "receita_id": dados_rec['id'], "qtd": multiplicador, "preco_venda_porcao": preco_sugerido 
                 })
                 st.rerun()
 
         if st.session_state.fila_producao:
-            def extrair_ingredientes_base(receita, mult_atual):
-                ingredientes_finais = []
-                for ing in receita['ingredients']:
-                    if ing.get('tipo', 'Ingrediente') == 'Sub-receita':
-                        sub_rec_dados = dict_receitas.get(ing['nome'])
-                        if sub_rec_dados:
-                            tam_pacote = max(ing['tam_pacote'], 0.0001)
-                            # EXATAMENTE AQUI OCORRE A MÁGICA DE EXTRAIR APENAS A PORÇÃO USADA:
-                            mult_sub = (ing['qtd_usada'] / tam_pacote) * mult_atual
-                            ingredientes_finais.extend(extrair_ingredientes_base(sub_rec_dados, mult_sub))
-                    else:
-                        ing_copy = ing.copy()
-                        medida = ing_copy.get('unidade', 'unid')
-                        qtd = ing_copy.get('qtd_usada', 0)
-                        tam = max(ing_copy.get('tam_pacote', 1), 0.0001)
-                        
-                        if medida == 'kg':
-                            qtd *= 1000; tam *= 1000; medida = 'g'
-                        elif medida == 'L':
-                            qtd *= 1000; tam *= 1000; medida = 'ml'
-                            
-                        ing_copy['qtd_usada'] = qtd * mult_atual
-                        ing_copy['tam_pacote'] = tam
-                        ing_copy['unidade'] = medida
-                        ing_copy['custo_final'] = (ing_copy['preco_compra'] / tam) * ing_copy['qtd_usada']
-                        ingredientes_finais.append(ing_copy)
-                return ingredientes_finais
+            try:
+                with etapa("planeador.tabelas"):
+                    tabelas = tabelas_planeador(st.session_state.fila_producao, markup_padrao, servico.versao())
+            except ErroCicloReceitas as erro:
+                st.error(f"🔁 {erro}. Corrija a receita antes de planear.")
+                st.stop()
+            if tabelas["em_falta"]:
+                st.session_state.fila_producao = [item for item in st.session_state.fila_producao if item['receita_id'] not in tabelas["em_falta"]]
+                st.toast(f"⚠️ {len(tabelas['em_falta'])} receita(s) da fila já não existem e foram retiradas.")
+                st.rerun()
 
             st.markdown("### 🔍 Tabela de Produção e Precificação")
             st.caption("Dê dois cliques na coluna **Fornadas** para alterar quantidades ou na coluna **Preço Venda (1 Porção)** para ajustar o lucro.")
             
-            tabela_por_receita = []
-            
-            for index, item in enumerate(st.session_state.fila_producao):
-                ing_puros_item = extrair_ingredientes_base(item['receita'], item['qtd'])
-                custo_total_fornada_produzida = sum(i['custo_final'] for i in ing_puros_item)
-                
-                rendimento_base = item['receita'].get('rendimento', 1.0)
-                porcoes_totais_produzidas = item['qtd'] * rendimento_base
-                custo_de_uma_porcao = custo_total_fornada_produzida / porcoes_totais_produzidas if porcoes_totais_produzidas > 0 else 0
-                
+            df_precificacao = tabelas["precificacao"]
+            # Itens novos ficam com o preço sugerido pelo markup inicial.
+            for item, preco in zip(st.session_state.fila_producao, df_precificacao[COL_PRECO_VENDA]):
                 if item.get('preco_venda_porcao') is None:
-                    item['preco_venda_porcao'] = custo_de_uma_porcao * markup_padrao
-                
-                venda_de_uma_porcao = item['preco_venda_porcao']
-                faturamento_total_desta_receita = venda_de_uma_porcao * porcoes_totais_produzidas
-                markup_real = venda_de_uma_porcao / custo_de_uma_porcao if custo_de_uma_porcao > 0 else 0
-                lucro_total_projetado = faturamento_total_desta_receita - custo_total_fornada_produzida
-                
-                tabela_por_receita.append({
-                    "Produto": item['receita']['name'],
-                    "✏️ Fornadas": float(item['qtd']),
-                    "Rende (Porções)": porcoes_totais_produzidas,
-                    "Custo (1 Porção)": float(custo_de_uma_porcao),
-                    "✏️ Preço Venda (1 Porção)": float(venda_de_uma_porcao),
-                    "Markup Atual": f"{markup_real:.2f}x",
-                    "Lucro Projetado (Total)": float(lucro_total_projetado)
-                })
+                    item['preco_venda_porcao'] = float(preco)
             
-            df_precificacao = pd.DataFrame(tabela_por_receita)
+            with etapa("planeador.data_editor"):
+                edited_df_analise = st.data_editor(
+                    df_precificacao,
+                    column_config={
+                        "Produto": st.column_config.TextColumn("Produto", disabled=True),
+                        "✏️ Fornadas": st.column_config.NumberColumn("✏️ Fornadas", min_value=0.0, step=1.0),
+                        "Rende (Porções)": st.column_config.NumberColumn("Rende (Porções)", disabled=True),
+                        "Custo (1 Porção)": st.column_config.NumberColumn("Custo (1 Porção)", format="R$ %.2f", disabled=True),
+                        "✏️ Preço Venda (1 Porção)": st.column_config.NumberColumn("✏️ Preço Venda (1 Porção)", format="R$ %.2f", min_value=0.0),
+                        "Markup Atual": st.column_config.TextColumn("Markup Atual", disabled=True),
+                        "Lucro Projetado (Total)": st.column_config.NumberColumn("Lucro Projetado (Total)", format="R$ %.2f", disabled=True)
+                    }, use_container_width=True, hide_index=True
+                )
             
-            edited_df_analise = st.data_editor(
-                df_precificacao,
-                column_config={
-                    "Produto": st.column_config.TextColumn("Produto", disabled=True),
-                    "✏️ Fornadas": st.column_config.NumberColumn("✏️ Fornadas", min_value=0.0, step=1.0),
-                    "Rende (Porções)": st.column_config.NumberColumn("Rende (Porções)", disabled=True),
-                    "Custo (1 Porção)": st.column_config.NumberColumn("Custo (1 Porção)", format="R$ %.2f", disabled=True),
-                    "✏️ Preço Venda (1 Porção)": st.column_config.NumberColumn("✏️ Preço Venda (1 Porção)", format="R$ %.2f", min_value=0.0),
-                    "Markup Atual": st.column_config.TextColumn("Markup Atual", disabled=True),
-                    "Lucro Projetado (Total)": st.column_config.NumberColumn("Lucro Projetado (Total)", format="R$ %.2f", disabled=True)
-                }, use_container_width=True, hide_index=True
-            )
+            alteradas = linhas_alteradas(edited_df_analise, df_precificacao)
+            for i in alteradas.nonzero()[0]:
+                novo_preco = edited_df_analise[COL_PRECO_VENDA].iat[i]
+                st.session_state.fila_producao[i]['preco_venda_porcao'] = None if pd.isna(novo_preco) else float(novo_preco)
+                st.session_state.fila_producao[i]['qtd'] = float(edited_df_analise[COL_FORNADAS].iat[i])
             
-            mudou = False
-            for i, row in edited_df_analise.iterrows():
-                novo_preco = row['✏️ Preço Venda (1 Porção)']
-                nova_qtd = row['✏️ Fornadas']
-                if st.session_state.fila_producao[i].get('preco_venda_porcao') != novo_preco or st.session_state.fila_producao[i]['qtd'] != nova_qtd:
-                    st.session_state.fila_producao[i]['preco_venda_porcao'] = novo_preco
-                    st.session_state.fila_producao[i]['qtd'] = nova_qtd
-                    mudou = True
-            
-            if mudou:
+            if alteradas.any():
                 st.session_state.fila_producao = [item for item in st.session_state.fila_producao if item['qtd'] > 0]
                 st.rerun()
 
             c_down_prec, c_clear = st.columns([1, 1])
-            csv_precificacao = df_precificacao.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig')
-            c_down_prec.download_button("⬇️ Exportar Precificação (CSV)", data=csv_precificacao, file_name="precificacao.csv", mime="text/csv", use_container_width=True)
+            c_down_prec.download_button("⬇️ Exportar Precificação (CSV)", data=para_download(lambda: [df_precificacao], "csv"), file_name="precificacao.csv", mime="text/csv", use_container_width=True)
             if c_clear.button("🗑️ Limpar Carrinho Inteiro", use_container_width=True):
                 st.session_state.fila_producao = []; st.rerun()
 
             st.divider()
 
             # --- CONSOLIDAÇÃO DA LISTA DE COMPRAS GERAL ---
-            ingredientes_consolidados = {}
-            custo_proporcional_total = 0
-            
-            for item in st.session_state.fila_producao:
-                lista_ingredientes_puros = extrair_ingredientes_base(item['receita'], item['qtd'])
-                for ing in lista_ingredientes_puros:
-                    nome = ing['nome']
-                    if nome not in ingredientes_consolidados:
-                        ingredientes_consolidados[nome] = {
-                            "qtd_total": 0, "tam_pacote": ing['tam_pacote'], 
-                            "preco_compra": ing['preco_compra'], "unidade": ing['unidade'], 
-                            "custo_prop_acumulado": 0
-                        }
-                    ingredientes_consolidados[nome]["qtd_total"] += ing['qtd_usada']
-                    ingredientes_consolidados[nome]["custo_prop_acumulado"] += ing['custo_final']
-                    custo_proporcional_total += ing['custo_final']
-
-            desembolso_mercado_total = 0
-            lista_compras = []
-            
-            for nome, dados in ingredientes_consolidados.items():
-                pacotes_necessarios = math.ceil(dados["qtd_total"] / dados["tam_pacote"]) if dados["tam_pacote"] > 0 else 0
-                custo_mercado_ing = pacotes_necessarios * dados["preco_compra"]
-                desembolso_mercado_total += custo_mercado_ing
-                
-                lista_compras.append({
-                    "Ingrediente": nome,
-                    "Necessidade Real": f"{dados['qtd_total']:.1f} {dados['unidade']}",
-                    "Comprar (Pacotes)": f"{pacotes_necessarios}x ({dados['tam_pacote']}{dados['unidade']})",
-                    "Desembolso Caixa": f"R$ {custo_mercado_ing:.2f}"
-                })
-
+            # Com vários tamanhos à venda, escolhe a combinação de pacotes mais barata que cobre a necessidade.
             st.markdown("### 📊 Orçamento Total Consolidado")
             col_res1, col_res2, col_res3 = st.columns(3)
-            with col_res1: cartao_financeiro("Custo Proporcional", custo_proporcional_total, "#FF9800", "⚖️", "Custo das gramas utilizadas.")
-            with col_res2: cartao_financeiro("Desembolso de Caixa", desembolso_mercado_total, "#F44336", "🛒", "Valor em pacotes fechados.")
+            with col_res1: cartao_financeiro("Custo Proporcional", tabelas["custo_proporcional"], "#FF9800", "⚖️", "Custo das gramas utilizadas.")
+            with col_res2: cartao_financeiro("Desembolso de Caixa", tabelas["desembolso"], "#F44336", "🛒", "Valor em pacotes fechados.")
             with col_res3:
-                faturamento_projetado = sum((item['preco_venda_porcao'] * (item['qtd'] * item['receita'].get('rendimento', 1.0))) for item in st.session_state.fila_producao)
-                cartao_financeiro("Faturamento Projetado", faturamento_projetado, "#4CAF50", "🤑", "Soma de todas as vendas.")
+                cartao_financeiro("Faturamento Projetado", tabelas["faturamento"], "#4CAF50", "🤑", "Soma de todas as vendas.")
             
             st.markdown("### 📝 Lista de Compras Otimizada (Mercado)")
-            df_compras = pd.DataFrame(lista_compras)
+            df_compras = tabelas["compras"]
             st.dataframe(df_compras, use_container_width=True, hide_index=True)
             
-            csv_compras = df_compras.to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig')
-            st.download_button("⬇️ Baixar Lista de Compras (CSV)", data=csv_compras, file_name="lista_compras.csv", mime="text/csv")
+            st.download_button("⬇️ Baixar Lista de Compras (CSV)", data=para_download(lambda: [df_compras], "csv"), file_name="lista_compras.csv", mime="text/csv")
 
             st.divider()
             
@@ -439,7 +472,7 @@ with aba_calculadora:
             nome_novo_plano = c_nome_plano.text_input("Nome (ex: Encomenda de Sábado)", value=st.session_state.nome_plano_atual)
             if c_salvar_plano.button("Salvar Planeamento", use_container_width=True):
                 if nome_novo_plano:
-                    salvar_planeamento(nome_novo_plano, st.session_state.fila_producao)
+                    servico.salvar_planeamento(nome_novo_plano, st.session_state.fila_producao)
                     st.session_state.nome_plano_atual = nome_novo_plano
                     st.success("Planeamento guardado no banco de dados com sucesso!")
                 else:
@@ -447,3 +480,29 @@ with aba_calculadora:
 
     else:
         st.warning("Para começar a planear, crie e guarde pelo menos uma receita na primeira aba.")
+
+# --- 5. DESEMPENHO DA PÁGINA (SÓ ADMINISTRAÇÃO) ---
+# Só aparece com `senha_admin` definida nos secrets; PANELA_METRICAS escolhe o ficheiro JSONL.
+with st.sidebar:
+    senha_admin = st.secrets.get("senha_admin")
+    eh_admin = bool(senha_admin) and st.text_input("Palavra-passe de administrador", type="password", key="senha_admin") == senha_admin
+    if eh_admin:
+        with st.expander("⏱️ Desempenho desta Execução"):
+            resumo_execucao = medidor.resumo()
+            st.metric("Tempo até aqui", f"{resumo_execucao['total_ms']:.0f} ms")
+            st.dataframe(
+                pd.DataFrame(
+                    [{"Etapa": nome, "ms": e["ms"], "Chamadas": e["chamadas"]} for nome, e in resumo_execucao["etapas"].items()],
+                    columns=["Etapa", "ms", "Chamadas"]
+                ).sort_values("ms", ascending=False),
+                use_container_width=True, hide_index=True
+            )
+            st.json(resumo_execucao["contadores"])
+            st.toggle("Registar cada execução em JSONL", key="registar_metricas")
+            st.caption(os.environ.get("PANELA_METRICAS", "metricas_panela.jsonl"))
+    # O registo também depende da palavra-passe, não só do interruptor que ficou na sessão.
+    if eh_admin and st.session_state.get("registar_metricas"):
+        medidor.gravar_jsonl(
+            os.environ.get("PANELA_METRICAS", "metricas_panela.jsonl"),
+            receitas=len(receitas_salvas), itens_fila=len(st.session_state.fila_producao)
+        )
@@ -0,0 +1,73 @@
+import io
+
+import pytest
+
+from panela.armazenamento import SQLiteArmazenamento
+from panela.importacao import MOTIVO_NUMERO, importar_precos, importar_receitas, ler_linhas
+from panela.servico import ServicoPanela
+
+
+def _csv(texto):
+    return list(ler_linhas(io.BytesIO(texto.encode("utf-8")), formato="csv"))
+
+
+@pytest.fixture
+def servico(tmp_path):
+    return ServicoPanela(SQLiteArmazenamento(str(tmp_path / "panela.db")))
+
+
+def test_csv_com_ponto_e_virgula_e_virgula_decimal():
+    linhas = _csv("Nome;Preço Pacote;Tam_Pacote;Medida\nFarinha;5,50;1;kg\n\nAçúcar;4,20;1;kg\n")
+    assert linhas == [
+        (2, {"nome": "Farinha", "preco_pacote": "5,50", "tam_pacote": "1", "medida": "kg"}),
+        (4, {"nome": "Açúcar", "preco_pacote": "4,20", "tam_pacote": "1", "medida": "kg"}),
+    ]
+
+
+def test_recusa_milhares_sem_decimal(servico):
+    linhas = _csv("Nome;Preco_Pacote;Tam_Pacote;Medida\nFarinha;1.250;1;kg\nAçúcar;1.250,00;1;kg\n")
+    relatorio = importar_precos(servico, linhas, simular=True)
+    assert relatorio["rejeitadas"] == [{"linha": 2, "receita": "", "motivo": MOTIVO_NUMERO}]
+    assert relatorio["importados"] == {"ingredients": 1}
+
+
+def test_tabela_de_precos_substitui_os_skus(servico):
+    importar_precos(servico, _csv("Nome;Preco_Pacote;Tam_Pacote;Medida\nFarinha;5;1;kg\nFarinha;20;5;kg\n"))
+    assert servico.mestre.skus(servico.mestre.obter("farinha")) == [(1000, 5.0), (5000, 20.0)]
+
+    importar_precos(servico, _csv("Nome;Preco_Pacote;Tam_Pacote;Medida\nFarinha;6;1;kg\n"))
+    assert servico.mestre.skus(servico.mestre.obter("farinha")) == [(1000, 6.0)]
+
+
+def test_sub_receitas_da_folha_e_do_catalogo(servico):
+    servico.salvar_receita("Molho", "Chef", [{"tipo": "Ingrediente", "nome": "Tomate", "preco_compra": 8.0, "tam_pacote": 1000,
+                                             "unidade": "g", "qtd_usada": 500, "custo_final": 4.0}], 4)
+    linhas = _csv(
+        "Receita;Rendimento;Tipo;Nome;Preco_Pacote;Tam_Pacote;Medida;Qtd_Usada\n"
+        "Massa;2;Ingrediente;Farinha;5;1;kg;0,4\n"
+        "Pizza;1;Sub-receita;Massa;;;porções;1\n"
+        "Pizza;1;Sub-receita;Molho;;;porções;2\n"
+        "Lasanha;1;Sub-receita;Bechamel;;;porções;1\n"
+    )
+
+    relatorio = importar_receitas(servico, linhas)
+
+    assert relatorio["importados"]["recipes"] == 2
+    assert [r["linha"] for r in relatorio["rejeitadas"]] == [5]
+    assert "Sub-receita desconhecida: Bechamel" in relatorio["rejeitadas"][0]["motivo"]
+    assert servico.catalogo.por_nome()["Pizza"]["total_cost"] == pytest.approx(1.0 + 2.0)
+
+
+def test_recusa_ciclos_de_sub_receitas(servico):
+    linhas = _csv(
+        "Receita;Tipo;Nome;Preco_Pacote;Tam_Pacote;Medida;Qtd_Usada\n"
+        "A;Sub-receita;B;;;porções;1\n"
+        "B;Sub-receita;A;;;porções;1\n"
+        "C;Ingrediente;Sal;2;1;kg;0,01\n"
+    )
+
+    relatorio = importar_receitas(servico, linhas, simular=True)
+
+    assert relatorio["importados"]["recipes"] == 1
+    assert {r["receita"] for r in relatorio["rejeitadas"]} == {"A", "B"}
+    assert all("Ciclo de sub-receitas" in r["motivo"] for r in relatorio["rejeitadas"])
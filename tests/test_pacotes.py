@@ -0,0 +1,58 @@
+import itertools
+import math
+import random
+
+from panela.pacotes import otimizar_pacotes
+
+
+def _forca_bruta(qtd, skus):
+    melhor = math.inf
+    for contagens in itertools.product(*[range(math.ceil(qtd / tam) + 1) for tam, _ in skus]):
+        if sum(n * tam for n, (tam, _) in zip(contagens, skus)) >= qtd - 1e-9:
+            melhor = min(melhor, sum(n * preco for n, (_, preco) in zip(contagens, skus)))
+    return melhor
+
+
+def _coberto(contagens, skus):
+    return sum(n * tam for n, (tam, _) in zip(contagens, skus))
+
+
+def test_pacote_menor_que_a_grelha_cobre_a_necessidade():
+    skus = [(200, 1.0), (1000, 4.5), (12000, 40.0)]
+    custo, contagens = otimizar_pacotes(5000, skus)
+    assert _coberto(contagens, skus) >= 5000
+    assert custo == _forca_bruta(5000, skus)
+
+
+def test_tamanhos_sem_divisor_comum_dao_o_otimo():
+    skus = [(1001, 17.92), (500, 3.14)]
+    custo, contagens = otimizar_pacotes(9779.6, skus)
+    assert _coberto(contagens, skus) >= 9779.6
+    assert math.isclose(custo, 62.80)
+
+
+def test_producao_grande_nunca_pior_que_um_so_tamanho():
+    skus = [(1000, 5.0), (333.3, 2.0)]
+    custo, contagens = otimizar_pacotes(50000, skus)
+    assert (custo, contagens) == (250.0, [50, 0])
+
+    aleatorio = random.Random(7)
+    for _ in range(8):
+        skus = [(round(aleatorio.uniform(150, 1500), 1), round(aleatorio.uniform(0.5, 30), 2)) for _ in range(2)]
+        qtd = round(aleatorio.uniform(50000, 200000), 1)
+        custo, contagens = otimizar_pacotes(qtd, skus)
+        assert _coberto(contagens, skus) >= qtd - 1e-6
+        assert custo <= min(math.ceil(qtd / tam) * preco for tam, preco in skus) + 1e-9
+
+
+def test_igual_a_forca_bruta():
+    aleatorio = random.Random(3)
+    for _ in range(200):
+        skus = [
+            (aleatorio.choice([aleatorio.randint(150, 2000), round(aleatorio.uniform(150, 1500), 1)]), round(aleatorio.uniform(0.5, 30), 2))
+            for _ in range(aleatorio.choice([2, 3]))
+        ]
+        qtd = round(aleatorio.uniform(1, 6000), 1)
+        custo, contagens = otimizar_pacotes(qtd, skus)
+        assert _coberto(contagens, skus) >= qtd - 1e-6
+        assert custo <= _forca_bruta(qtd, skus) + 1e-9
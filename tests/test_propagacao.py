@@ -0,0 +1,78 @@
+import pytest
+
+from panela.armazenamento import SQLiteArmazenamento
+from panela.grafo import ErroCicloReceitas, GrafoReceitas
+from panela.importacao import importar_precos
+from panela.servico import ServicoPanela
+
+
+def _ingrediente(nome, preco, tam, unidade, qtd):
+    return {"tipo": "Ingrediente", "nome": nome, "preco_compra": preco, "tam_pacote": tam, "unidade": unidade,
+            "qtd_usada": qtd, "custo_final": preco / tam * qtd}
+
+
+def _sub_receita(receita, qtd, unidade="porções"):
+    tam = 1.0 if unidade == "receita" else receita["rendimento"]
+    return {"tipo": "Sub-receita", "nome": receita["name"], "preco_compra": receita["total_cost"], "tam_pacote": tam,
+            "unidade": unidade, "qtd_usada": qtd, "custo_final": receita["total_cost"] / tam * qtd}
+
+
+@pytest.fixture
+def servico(tmp_path):
+    # Massa ← Pizza ← Combo, e Pão também usa farinha.
+    servico = ServicoPanela(SQLiteArmazenamento(str(tmp_path / "panela.db")))
+    servico.salvar_receita("Massa", "Chef", [_ingrediente("Farinha", 5.0, 1000, "g", 500)], 4)
+    servico.salvar_receita("Pizza", "Chef", [_sub_receita(servico.catalogo.por_nome()["Massa"], 0.5, "receita")], 2)
+    servico.salvar_receita("Combo", "Chef", [_sub_receita(servico.catalogo.por_nome()["Pizza"], 1)], 1)
+    servico.salvar_receita("Pão", "Chef", [_ingrediente("Farinha", 5.0, 1000, "g", 200)], 8)
+    return servico
+
+
+def _custos(servico):
+    return {nome: r["total_cost"] for nome, r in servico.catalogo.por_nome().items()}
+
+
+def test_base_alterada_chega_as_receitas_avos(servico):
+    assert _custos(servico)["Combo"] == pytest.approx(0.625)
+
+    n = servico.salvar_receita("Massa", "Chef", [_ingrediente("Farinha", 5.0, 1000, "g", 1000)], 4)
+
+    assert n == 2
+    custos = _custos(servico)
+    assert custos["Massa"] == pytest.approx(5.0)
+    assert custos["Pizza"] == pytest.approx(2.5)
+    assert custos["Combo"] == pytest.approx(1.25)
+    assert custos["Pão"] == pytest.approx(1.0)
+    linha = servico.catalogo.por_nome()["Pizza"]["ingredients"][0]
+    # Em "receita" o pacote continua a ser a fornada inteira, não o rendimento.
+    assert (linha["preco_compra"], linha["tam_pacote"]) == (pytest.approx(5.0), 1.0)
+
+
+def test_importacao_de_precos_chega_a_todas_as_receitas_que_usam_o_ingrediente(servico):
+    linhas = [(2, {"nome": "farinha", "preco_pacote": "10,00", "tam_pacote": "1", "medida": "kg"})]
+
+    relatorio = importar_precos(servico, linhas)
+
+    assert relatorio["receitas_recalculadas"] == 4
+    custos = _custos(servico)
+    assert custos["Massa"] == pytest.approx(5.0)
+    assert custos["Pão"] == pytest.approx(2.0)
+    assert custos["Pizza"] == pytest.approx(2.5)
+    assert custos["Combo"] == pytest.approx(1.25)
+
+
+def test_verificar_sem_ciclo():
+    grafo = GrafoReceitas({
+        "A": {"name": "A", "ingredients": [_sub_receita({"name": "B", "rendimento": 1, "total_cost": 0}, 1)]},
+        "B": {"name": "B", "ingredients": []},
+    })
+
+    with pytest.raises(ErroCicloReceitas) as proprio:
+        grafo.verificar_sem_ciclo("A", [_sub_receita({"name": "A", "rendimento": 1, "total_cost": 0}, 1)])
+    assert proprio.value.ciclo == ["A", "A"]
+
+    with pytest.raises(ErroCicloReceitas) as dois:
+        grafo.verificar_sem_ciclo("B", [_sub_receita({"name": "A", "rendimento": 1, "total_cost": 0}, 1)])
+    assert dois.value.ciclo == ["B", "A", "B"]
+
+    grafo.verificar_sem_ciclo("C", [_sub_receita({"name": "A", "rendimento": 1, "total_cost": 0}, 1)])
@@ -0,0 +1,35 @@
+import pytest
+
+from panela.armazenamento import SQLiteArmazenamento
+from panela.servico import ServicoPanela
+
+
+def _farinha(preco, qtd=500):
+    return {"tipo": "Ingrediente", "nome": "Farinha", "preco_compra": preco, "tam_pacote": 1000, "unidade": "g",
+            "qtd_usada": qtd, "custo_final": preco / 1000 * qtd}
+
+
+@pytest.fixture
+def servico(tmp_path):
+    servico = ServicoPanela(SQLiteArmazenamento(str(tmp_path / "panela.db")))
+    servico.salvar_receita("Pão", "Chef", [_farinha(5.0)], 10)
+    return servico
+
+
+def test_preco_do_editor_so_muda_o_mestre_com_confirmacao(servico):
+    assert servico.mestre.precos_divergentes([_farinha(8.0)]) == {"farinha": ("Farinha", 5.0, 8.0)}
+
+    servico.salvar_receita("Pão", "Chef", [_farinha(8.0)], 10)
+    assert servico.mestre.obter("farinha")["preco_compra"] == 5.0
+    assert servico.catalogo.por_nome()["Pão"]["total_cost"] == pytest.approx(2.5)
+
+    servico.salvar_receita("Pão", "Chef", [_farinha(8.0)], 10, atualizar_precos=True)
+    assert servico.mestre.obter("farinha")["preco_compra"] == 8.0
+    assert servico.catalogo.por_nome()["Pão"]["total_cost"] == pytest.approx(4.0)
+
+
+def test_receita_guardada_nao_conta_como_dependente(servico):
+    servico.salvar_receita("Bolo", "Chef", [_farinha(5.0, 200)], 8)
+    assert servico.salvar_receita("Pão", "Chef", [_farinha(5.0)], 10) == 0
+    assert servico.salvar_receita("Pão", "Chef", [_farinha(6.0)], 10, atualizar_precos=True) == 1
+    assert servico.catalogo.por_nome()["Bolo"]["total_cost"] == pytest.approx(1.2)